@@ -7,6 +7,7 @@ node_list = [
     "flux_tools",
     "config_node",
     "utils",
+    "export",
 ]
 
 NODE_CLASS_MAPPINGS = {}
@@ -18,6 +19,23 @@ for module_name in node_list:
     NODE_CLASS_MAPPINGS = {**NODE_CLASS_MAPPINGS, **imported_module.NODE_CLASS_MAPPINGS}
     NODE_DISPLAY_NAME_MAPPINGS = {**NODE_DISPLAY_NAME_MAPPINGS, **imported_module.NODE_DISPLAY_NAME_MAPPINGS}
 
+# Open the shared keep-alive connections to the API before the first node runs
+importlib.import_module(".nodes.session", __name__).warm_up()
+# Optional webhook receiver (see [WEBHOOK] in config.ini)
+importlib.import_module(".nodes.webhook", __name__).setup()
+# Optional latency-aware host selection (see [ROUTING] in config.ini)
+importlib.import_module(".nodes.routing", __name__).setup()
+# Counters of the encoded image cache at /bfl/encode_cache (see [ENCODE_CACHE] in config.ini)
+importlib.import_module(".nodes.encode_cache", __name__).setup()
+# Optional hosting of input images so requests carry URLs (see [IMAGE_STORE] in config.ini)
+importlib.import_module(".nodes.image_store", __name__).setup()
+# Counters of the on-disk result cache at /bfl/result_cache (see [RESULT_CACHE] in config.ini)
+importlib.import_module(".nodes.result_cache", __name__).setup()
+# Cached credits balance at /bfl/credits, polled by the Flux Credits widget (see [CREDITS] in config.ini)
+importlib.import_module(".nodes.credits", __name__).setup()
+# List the account's finetunes in the background for the finetune dropdowns (see [FINETUNES] in config.ini)
+importlib.import_module(".nodes.finetune_catalog", __name__).setup()
+
 
 WEB_DIRECTORY = "./web"
 
@@ -0,0 +1,149 @@
+"""
+Benchmark of result decoding: the former decode, re-encode and decode again path against pil_to_tensor.
+
+Run from the repository root, with the same Python environment as ComfyUI:
+
+    python -m bench.decode_bench [--repeat 5] [--format jpeg png]
+
+For 1 MP and 4 MP JPEG results it reports the CPU time of one decode (best of --repeat runs) and the peak
+memory it adds. The former path is measured for each output_format, jpeg (the default of most nodes) and
+png, since it re-encoded to that format. Peak memory is measured as the growth of the peak RSS of a fresh
+interpreter, because tracemalloc does not see the pixel buffers of PIL and torch.
+"""
+
+import argparse
+import io
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import torch
+from PIL import Image
+
+from nodes.images import pil_to_tensor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SIZES = (1, 4)  # megapixels
+
+
+def reencode_decode(data, output_format="jpeg"):
+    """The decode path before the single-decode change: decode, re-encode, decode again, float copy, divide."""
+    img = Image.open(io.BytesIO(data))
+    with io.BytesIO() as output:
+        img.save(output, format=output_format.upper())
+        output.seek(0)
+        img_converted = Image.open(output)
+        img_array = np.array(img_converted).astype(np.float32) / 255.0
+        return torch.from_numpy(img_array)[None,]
+
+
+def single_decode(data, output_format="jpeg", dtype=torch.float32):
+    """The current path of BaseFlux.decode_image: decode once, scale uint8 straight into `dtype`."""
+    with Image.open(io.BytesIO(data)) as img:
+        return pil_to_tensor(img, dtype)[None,]
+
+
+PATHS = {
+    "re-encode": reencode_decode,
+    "single decode": single_decode,
+    "single decode fp16": lambda data, output_format: single_decode(data, output_format, torch.float16),
+}
+
+
+def sample_jpeg(megapixels, quality=95):
+    """A square JPEG of `megapixels` with smooth gradients and a noisy channel, like a delivered result."""
+    side = int((megapixels * 2**20) ** 0.5)
+    gradient = np.linspace(0, 255, side, dtype=np.float32)
+    pixels = np.empty((side, side, 3), dtype=np.uint8)
+    pixels[..., 0] = gradient[None, :]
+    pixels[..., 1] = gradient[:, None]
+    pixels[..., 2] = np.random.default_rng(0).integers(0, 256, (side, side), dtype=np.uint8)
+    with io.BytesIO() as output:
+        Image.fromarray(pixels).save(output, format="JPEG", quality=quality)
+        return output.getvalue()
+
+
+def cpu_ms(run, data, output_format, repeat):
+    run(data, output_format)  # warm up
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.process_time()
+        run(data, output_format)
+        best = min(best, time.process_time() - start)
+    return best * 1000
+
+
+def peak_mib(name, path, output_format):
+    """Peak RSS growth of one run in a fresh interpreter, or None where the resource module is unavailable."""
+    completed = subprocess.run(
+        [sys.executable, "-m", "bench.decode_bench", "--child", name, path, "--format", output_format],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    value = completed.stdout.strip()
+    return float(value) if value else None
+
+
+def child(name, path, output_format):
+    try:
+        import resource
+    except ImportError:
+        return
+    with open(path, "rb") as f:
+        data = f.read()
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    PATHS[name](data, output_format)
+    after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    unit = 1 if sys.platform == "darwin" else 1024  # ru_maxrss is in bytes on macOS, KiB elsewhere
+    print(f"{(after - before) * unit / 2**20:.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5, help="timed runs per case, the best one is reported")
+    parser.add_argument(
+        "--format",
+        nargs="+",
+        choices=["jpeg", "png"],
+        default=["jpeg", "png"],
+        help="output_format(s) the former path re-encoded to",
+    )
+    parser.add_argument("--child", nargs=2, metavar=("PATH", "FILE"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child(*args.child, args.format[0])
+        return
+
+    # The former path depends on output_format, the single decode does not
+    cases = [(f"re-encode {fmt} (before)", "re-encode", fmt) for fmt in args.format]
+    cases += [(name, name, "jpeg") for name in PATHS if name != "re-encode"]
+    print(f"{'size':>5}  {'path':<24}  {'CPU ms':>8}  {'peak MiB':>8}")
+    for megapixels in SIZES:
+        data = sample_jpeg(megapixels)
+        with tempfile.NamedTemporaryFile(suffix=".jpg", delete=False) as f:
+            f.write(data)
+        try:
+            results = {}
+            for label, name, fmt in cases:
+                results[label] = cpu_ms(PATHS[name], data, fmt, args.repeat), peak_mib(name, f.name, fmt)
+                ms, peak = results[label]
+                print(f"{megapixels:>3} MP  {label:<24}  {ms:>8.1f}  {peak if peak is not None else 'n/a':>8}")
+        finally:
+            os.remove(f.name)
+
+        after_ms, after_peak = results["single decode"]
+        for fmt in args.format:
+            before_ms, before_peak = results[f"re-encode {fmt} (before)"]
+            saving = f"{megapixels:>3} MP  vs {fmt}: CPU {before_ms / after_ms:.1f}x faster"
+            if before_peak is not None and after_peak is not None:
+                saving += f", {before_peak - after_peak:.1f} MiB less peak memory"
+            print(saving)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Check of the streaming request body: eight large references posted to a local server through post_request.
+
+Run from the repository root, with the same Python environment as ComfyUI:
+
+    python -m bench.request_body_bench [--reference-mib 4]
+
+The server answers the first submit with 503, so the body is sent twice through call_with_retry. Both
+bodies must be byte for byte `json.dumps(arguments)`, sent with a Content-Length, and the tracemalloc peak
+while posting must stay under MAX_PEAK_BYTES, far below the size of the payload.
+"""
+
+import argparse
+import base64
+import hashlib
+import json
+import os
+import sys
+import threading
+import tracemalloc
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from nodes.base import BaseFlux
+
+REFERENCES = 8
+READ_SIZE = 64 * 1024
+MAX_PEAK_BYTES = 4 * 1024 * 1024  # one materialised copy of the default 32 MiB body would be 8x this
+TASK_ID = "bench-task"
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        # Hash the body while reading it, so the server does not hold a copy in this process's memory
+        length = int(self.headers.get("Content-Length") or 0)
+        digest = hashlib.sha256()
+        remaining = length
+        while remaining:
+            chunk = self.rfile.read(min(remaining, READ_SIZE))
+            if not chunk:
+                break
+            digest.update(chunk)
+            remaining -= len(chunk)
+        self.server.received.append(
+            {
+                "content_length": self.headers.get("Content-Length"),
+                "bytes": length - remaining,
+                "sha256": digest.hexdigest(),
+            }
+        )
+        if len(self.server.received) == 1:
+            self._reply(503, {"detail": "Service temporarily unavailable"})
+        else:
+            self._reply(200, {"id": TASK_ID})
+
+    def _reply(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def reference_arguments(reference_bytes):
+    """Flux 2 style arguments with REFERENCES distinct base64 images of `reference_bytes` each."""
+    arguments = {"prompt": "A still life with eight references", "seed": 42, "output_format": "png"}
+    for i in range(REFERENCES):
+        field = "input_image" if i == 0 else f"input_image_{i + 1}"
+        arguments[field] = base64.b64encode(os.urandom(reference_bytes * 3 // 4)).decode("ascii")
+    return arguments
+
+
+def check(condition, message):
+    if not condition:
+        raise SystemExit(f"FAIL: {message}")
+    print(f"ok: {message}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--reference-mib", type=float, default=4, help="base64 size of each reference image")
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    server.received = []
+    threading.Thread(target=server.serve_forever, name="bench-server", daemon=True).start()
+    config = {"x_key": "bench", "base_url": f"http://127.0.0.1:{server.server_address[1]}/v1/"}
+
+    arguments = reference_arguments(int(args.reference_mib * 2**20))
+    expected = json.dumps(arguments).encode("utf-8")
+    expected_length, expected_sha256 = len(expected), hashlib.sha256(expected).hexdigest()
+    del expected
+    print(f"Posting {REFERENCES} references, {expected_length / 2**20:.1f} MiB of JSON")
+
+    tracemalloc.start()
+    try:
+        task_id = BaseFlux().post_request("flux-2-pro", arguments, config)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+        server.shutdown()
+
+    check(task_id == TASK_ID, "the submit succeeded after a 503")
+    check(len(server.received) == 2, "the body was sent twice")
+    for attempt, received in enumerate(server.received, start=1):
+        check(received["content_length"] == str(expected_length), f"attempt {attempt} sent a Content-Length")
+        check(
+            received["bytes"] == expected_length and received["sha256"] == expected_sha256,
+            f"attempt {attempt} body matches json.dumps(arguments)",
+        )
+    check(
+        peak < MAX_PEAK_BYTES,
+        f"tracemalloc peak {peak / 2**20:.2f} MiB < {MAX_PEAK_BYTES / 2**20:.0f} MiB "
+        f"for a {expected_length / 2**20:.1f} MiB body",
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,7 +1,8 @@
-import requests
-import json
 from .base import BaseFlux
 from .config_node import get_config_loader
+from .credits import format_credits, get_credits_cache
+from .engine import run_options
+from .fingerprint import ttl_fingerprint
 
 
 class FluxPro11(BaseFlux):
@@ -137,6 +138,11 @@ class FluxPro11Ultra(BaseFlux):
 
 
 class FluxProFill(BaseFlux):
+    TENSOR_INPUTS = {
+        "image_tensor": ("IMAGE", "image"),
+        "mask_tensor": ("MASK", "mask"),
+    }
+
     @classmethod
     def INPUT_TYPES(cls):
         return {
@@ -173,7 +179,8 @@ class FluxProFill(BaseFlux):
         if mask is not None:
             if mask:
                 arguments["mask"] = mask
-            else:
+            elif "mask_tensor" not in run_options().get("tensor_inputs", {}):
+                # A connected mask_tensor fills the mask field when the request is sent
                 print("Warning: Mask image could not be encoded. Proceeding without mask.")
         if prompt is not None:
             arguments["prompt"] = prompt
@@ -185,6 +192,14 @@ class FluxProFill(BaseFlux):
 
 
 class FluxKontextPro(BaseFlux):
+    TENSOR_INPUTS = {
+        "input_image_tensor": ("IMAGE", "input_image"),
+        "input_image_2_tensor": ("IMAGE", "input_image_2"),
+        "input_image_3_tensor": ("IMAGE", "input_image_3"),
+        "input_image_4_tensor": ("IMAGE", "input_image_4"),
+    }
+    IMAGE_URLS = True
+
     @classmethod
     def INPUT_TYPES(cls):
         return {
@@ -235,6 +250,14 @@ class FluxKontextPro(BaseFlux):
 
 
 class FluxKontextMax(BaseFlux):
+    TENSOR_INPUTS = {
+        "input_image_tensor": ("IMAGE", "input_image"),
+        "input_image_2_tensor": ("IMAGE", "input_image_2"),
+        "input_image_3_tensor": ("IMAGE", "input_image_3"),
+        "input_image_4_tensor": ("IMAGE", "input_image_4"),
+    }
+    IMAGE_URLS = True
+
     @classmethod
     def INPUT_TYPES(cls):
         return {
@@ -286,6 +309,9 @@ class FluxKontextMax(BaseFlux):
 
 class FluxProExpand(BaseFlux):
     CATEGORY = "BFL"
+    TENSOR_INPUTS = {
+        "image_tensor": ("IMAGE", "image"),
+    }
 
     @classmethod
     def INPUT_TYPES(cls):
@@ -337,6 +363,18 @@ class FluxProExpand(BaseFlux):
 
 class Flux2Max(BaseFlux):
     CATEGORY = "BFL/Flux2"
+    CHECK_MULTIPLE_OF_32 = False
+    TENSOR_INPUTS = {
+        "input_image_tensor": ("IMAGE", "input_image"),
+        "input_image_2_tensor": ("IMAGE", "input_image_2"),
+        "input_image_3_tensor": ("IMAGE", "input_image_3"),
+        "input_image_4_tensor": ("IMAGE", "input_image_4"),
+        "input_image_5_tensor": ("IMAGE", "input_image_5"),
+        "input_image_6_tensor": ("IMAGE", "input_image_6"),
+        "input_image_7_tensor": ("IMAGE", "input_image_7"),
+        "input_image_8_tensor": ("IMAGE", "input_image_8"),
+    }
+    IMAGE_URLS = True
 
     @classmethod
     def INPUT_TYPES(cls):
@@ -391,19 +429,23 @@ class Flux2Max(BaseFlux):
             arguments["webhook_url"] = webhook_url
         if webhook_secret:
             arguments["webhook_secret"] = webhook_secret
-        try:
-            task_id = self.post_request("flux-2-max", arguments, config)
-            if task_id:
-                print(f"Task ID '{task_id}'")
-                return self.get_result(task_id, output_format=output_format, config_override=config)
-            return self.create_blank_image()
-        except Exception as e:
-            print(f"Error generating image: {str(e)}")
-            return self.create_blank_image()
+        return super().generate_image("flux-2-max", arguments, config)
 
 
 class Flux2Pro(BaseFlux):
     CATEGORY = "BFL/Flux2"
+    CHECK_MULTIPLE_OF_32 = False
+    TENSOR_INPUTS = {
+        "input_image_tensor": ("IMAGE", "input_image"),
+        "input_image_2_tensor": ("IMAGE", "input_image_2"),
+        "input_image_3_tensor": ("IMAGE", "input_image_3"),
+        "input_image_4_tensor": ("IMAGE", "input_image_4"),
+        "input_image_5_tensor": ("IMAGE", "input_image_5"),
+        "input_image_6_tensor": ("IMAGE", "input_image_6"),
+        "input_image_7_tensor": ("IMAGE", "input_image_7"),
+        "input_image_8_tensor": ("IMAGE", "input_image_8"),
+    }
+    IMAGE_URLS = True
 
     @classmethod
     def INPUT_TYPES(cls):
@@ -458,19 +500,23 @@ class Flux2Pro(BaseFlux):
             arguments["webhook_url"] = webhook_url
         if webhook_secret:
             arguments["webhook_secret"] = webhook_secret
-        try:
-            task_id = self.post_request("flux-2-pro", arguments, config)
-            if task_id:
-                print(f"Task ID '{task_id}'")
-                return self.get_result(task_id, output_format=output_format, config_override=config)
-            return self.create_blank_image()
-        except Exception as e:
-            print(f"Error generating image: {str(e)}")
-            return self.create_blank_image()
+        return super().generate_image("flux-2-pro", arguments, config)
 
 
 class Flux2ProPreview(BaseFlux):
     CATEGORY = "BFL/Flux2"
+    CHECK_MULTIPLE_OF_32 = False
+    TENSOR_INPUTS = {
+        "input_image_tensor": ("IMAGE", "input_image"),
+        "input_image_2_tensor": ("IMAGE", "input_image_2"),
+        "input_image_3_tensor": ("IMAGE", "input_image_3"),
+        "input_image_4_tensor": ("IMAGE", "input_image_4"),
+        "input_image_5_tensor": ("IMAGE", "input_image_5"),
+        "input_image_6_tensor": ("IMAGE", "input_image_6"),
+        "input_image_7_tensor": ("IMAGE", "input_image_7"),
+        "input_image_8_tensor": ("IMAGE", "input_image_8"),
+    }
+    IMAGE_URLS = True
 
     @classmethod
     def INPUT_TYPES(cls):
@@ -525,19 +571,23 @@ class Flux2ProPreview(BaseFlux):
             arguments["webhook_url"] = webhook_url
         if webhook_secret:
             arguments["webhook_secret"] = webhook_secret
-        try:
-            task_id = self.post_request("flux-2-pro-preview", arguments, config)
-            if task_id:
-                print(f"Task ID '{task_id}'")
-                return self.get_result(task_id, output_format=output_format, config_override=config)
-            return self.create_blank_image()
-        except Exception as e:
-            print(f"Error generating image: {str(e)}")
-            return self.create_blank_image()
+        return super().generate_image("flux-2-pro-preview", arguments, config)
 
 
 class Flux2Flex(BaseFlux):
     CATEGORY = "BFL/Flux2"
+    CHECK_MULTIPLE_OF_32 = False
+    TENSOR_INPUTS = {
+        "input_image_tensor": ("IMAGE", "input_image"),
+        "input_image_2_tensor": ("IMAGE", "input_image_2"),
+        "input_image_3_tensor": ("IMAGE", "input_image_3"),
+        "input_image_4_tensor": ("IMAGE", "input_image_4"),
+        "input_image_5_tensor": ("IMAGE", "input_image_5"),
+        "input_image_6_tensor": ("IMAGE", "input_image_6"),
+        "input_image_7_tensor": ("IMAGE", "input_image_7"),
+        "input_image_8_tensor": ("IMAGE", "input_image_8"),
+    }
+    IMAGE_URLS = True
 
     @classmethod
     def INPUT_TYPES(cls):
@@ -596,19 +646,19 @@ class Flux2Flex(BaseFlux):
             arguments["webhook_url"] = webhook_url
         if webhook_secret:
             arguments["webhook_secret"] = webhook_secret
-        try:
-            task_id = self.post_request("flux-2-flex", arguments, config)
-            if task_id:
-                print(f"Task ID '{task_id}'")
-                return self.get_result(task_id, output_format=output_format, config_override=config)
-            return self.create_blank_image()
-        except Exception as e:
-            print(f"Error generating image: {str(e)}")
-            return self.create_blank_image()
+        return super().generate_image("flux-2-flex", arguments, config)
 
 
 class Flux2Klein9b(BaseFlux):
     CATEGORY = "BFL/Flux2"
+    CHECK_MULTIPLE_OF_32 = False
+    TENSOR_INPUTS = {
+        "input_image_tensor": ("IMAGE", "input_image"),
+        "input_image_2_tensor": ("IMAGE", "input_image_2"),
+        "input_image_3_tensor": ("IMAGE", "input_image_3"),
+        "input_image_4_tensor": ("IMAGE", "input_image_4"),
+    }
+    IMAGE_URLS = True
 
     @classmethod
     def INPUT_TYPES(cls):
@@ -656,19 +706,19 @@ class Flux2Klein9b(BaseFlux):
             arguments["webhook_url"] = webhook_url
         if webhook_secret:
             arguments["webhook_secret"] = webhook_secret
-        try:
-            task_id = self.post_request("flux-2-klein-9b", arguments, config)
-            if task_id:
-                print(f"Task ID '{task_id}'")
-                return self.get_result(task_id, output_format=output_format, config_override=config)
-            return self.create_blank_image()
-        except Exception as e:
-            print(f"Error generating image: {str(e)}")
-            return self.create_blank_image()
+        return super().generate_image("flux-2-klein-9b", arguments, config)
 
 
 class Flux2Klein9bPreview(BaseFlux):
     CATEGORY = "BFL/Flux2"
+    CHECK_MULTIPLE_OF_32 = False
+    TENSOR_INPUTS = {
+        "input_image_tensor": ("IMAGE", "input_image"),
+        "input_image_2_tensor": ("IMAGE", "input_image_2"),
+        "input_image_3_tensor": ("IMAGE", "input_image_3"),
+        "input_image_4_tensor": ("IMAGE", "input_image_4"),
+    }
+    IMAGE_URLS = True
 
     @classmethod
     def INPUT_TYPES(cls):
@@ -716,19 +766,19 @@ class Flux2Klein9bPreview(BaseFlux):
             arguments["webhook_url"] = webhook_url
         if webhook_secret:
             arguments["webhook_secret"] = webhook_secret
-        try:
-            task_id = self.post_request("flux-2-klein-9b-preview", arguments, config)
-            if task_id:
-                print(f"Task ID '{task_id}'")
-                return self.get_result(task_id, output_format=output_format, config_override=config)
-            return self.create_blank_image()
-        except Exception as e:
-            print(f"Error generating image: {str(e)}")
-            return self.create_blank_image()
+        return super().generate_image("flux-2-klein-9b-preview", arguments, config)
 
 
 class Flux2Klein4b(BaseFlux):
     CATEGORY = "BFL/Flux2"
+    CHECK_MULTIPLE_OF_32 = False
+    TENSOR_INPUTS = {
+        "input_image_tensor": ("IMAGE", "input_image"),
+        "input_image_2_tensor": ("IMAGE", "input_image_2"),
+        "input_image_3_tensor": ("IMAGE", "input_image_3"),
+        "input_image_4_tensor": ("IMAGE", "input_image_4"),
+    }
+    IMAGE_URLS = True
 
     @classmethod
     def INPUT_TYPES(cls):
@@ -776,15 +826,7 @@ class Flux2Klein4b(BaseFlux):
             arguments["webhook_url"] = webhook_url
         if webhook_secret:
             arguments["webhook_secret"] = webhook_secret
-        try:
-            task_id = self.post_request("flux-2-klein-4b", arguments, config)
-            if task_id:
-                print(f"Task ID '{task_id}'")
-                return self.get_result(task_id, output_format=output_format, config_override=config)
-            return self.create_blank_image()
-        except Exception as e:
-            print(f"Error generating image: {str(e)}")
-            return self.create_blank_image()
+        return super().generate_image("flux-2-klein-4b", arguments, config)
 
 
 class FluxCredits:
@@ -797,15 +839,18 @@ class FluxCredits:
     def INPUT_TYPES(cls):
         return {"optional": {"config": ("BFL_CONFIG",)}}
 
+    @classmethod
+    def IS_CHANGED(cls, config=None):
+        return ttl_fingerprint(get_credits_cache().ttl, config)
+
     def get_credits(self, config=None):
-        config_loader_instance = get_config_loader(config)
-        headers = {"x-key": config_loader_instance.get_x_key()}
-        url = config_loader_instance.create_url("credits")
-        response = requests.get(url, headers=headers)
-        if response.status_code == 200:
-            result = json.dumps(response.json(), indent=2)
-        else:
-            result = f"Error {response.status_code}: {response.text}"
+        try:
+            value, _ = get_credits_cache().get(get_config_loader(config))
+            result = format_credits(value)
+        except RuntimeError as e:
+            result = str(e)
+        except Exception as e:
+            result = f"Error: {str(e)}"
         return {"ui": {"text": (result,)}, "result": (result,)}
 
 
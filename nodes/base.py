@@ -1,42 +1,258 @@
+import asyncio
+import functools
 import io
 import time
+from concurrent.futures import Future
 
 import numpy as np
 import requests
 import torch
-from PIL import Image
+from PIL import Image, ImageFile
 
+from .body import JsonBody
+from .budget import fit_base64, get_input_budget
 from .config_node import get_config_loader
+from .engine import is_deferred, node_run, run_coroutine_sync, run_options, supports_async_nodes
+from .export import RESULT_TYPE, DeliveredImage
+from .fingerprint import generation_fingerprint
+from .image_store import get_image_store, is_url
+from .images import encode_tensor_input, pil_to_tensor, resolve_output_dtype, tensor_nbytes
+from .poller import get_poller
+from .polling import get_polling_policy
+from .ratelimit import MAX_RATE_LIMIT_RETRIES, RateLimitedError, get_admission_controller, parse_retry_after
+from .result_cache import get_result_cache, request_key
+from .retry import CircuitOpenError, call_with_retry
+from .routing import polling_url_for, remember_polling_url, trusted_polling_url
+from .session import get_session
 from .status import Status
+from .webhook import get_webhook_receiver
 
-REQUEST_TIMEOUT = 300  # seconds for connect + read
+REQUEST_TIMEOUT = (10, 300)  # seconds for connect, and for the response to a submit
+POLL_TIMEOUT = (10, 30)  # seconds for connect, and for the response to a get_result poll
+DOWNLOAD_TIMEOUT = (10, 60)  # seconds for connect, and between bytes while reading the result image
+DOWNLOAD_DEADLINE = 180  # seconds for the whole result download
+DOWNLOAD_CHUNK_SIZE = 256 * 1024
+MAX_DOWNLOAD_BYTES = 64 * 1024 * 1024
+MAX_BATCH_SIZE = 16
+DEFAULT_BATCH_CONCURRENCY = 4
+UNDECODED_IMAGE_SIZE = 64  # side of the black IMAGE output of nodes run with decode off
+
+
+# Optional inputs added to every BaseFlux node, consumed by the entry points rather than generate_image
+SHARED_INPUTS = {
+    "batch_size": (
+        "INT",
+        {
+            "default": 1,
+            "min": 1,
+            "max": MAX_BATCH_SIZE,
+            "tooltip": (
+                "Number of images to generate concurrently, returned as one IMAGE batch. "
+                "With a seed set, image i uses seed + i; with seed -1 every image gets a random seed."
+            ),
+        },
+    ),
+    "batch_failure": (
+        ["retry", "drop", "placeholder"],
+        {
+            "default": "retry",
+            "tooltip": (
+                "What to do with batch slots that fail: retry them once and drop them if they fail again, "
+                "drop them from the batch, or keep a black placeholder image in their place."
+            ),
+        },
+    ),
+    "decode": (
+        "BOOLEAN",
+        {
+            "default": True,
+            "tooltip": (
+                "Decode the result into the IMAGE output. Turn off when only the result output is used, "
+                "e.g. by Save Result (BFL); IMAGE then carries a small black image."
+            ),
+        },
+    ),
+    "output_dtype": (
+        ["default", "float32", "float16"],
+        {
+            "default": "default",
+            "tooltip": (
+                "Precision of the IMAGE output. float16 halves its memory; default uses DTYPE from [OUTPUT] "
+                "in config.ini (float32 unless set)."
+            ),
+        },
+    ),
+}
+
+
+# Hidden inputs added to every BaseFlux node: the queued prompt and this node's id, to see which outputs are used
+HIDDEN_INPUTS = {"bfl_prompt": "PROMPT", "bfl_node_id": "UNIQUE_ID"}
+
+
+def output_linked(prompt, node_id, index):
+    """True when output `index` of node `node_id` feeds another node of `prompt`, or when that is unknown."""
+    if not prompt or node_id is None:
+        return True
+    for node in prompt.values():
+        for value in (node.get("inputs") or {}).values():
+            if isinstance(value, list) and len(value) == 2 and str(value[0]) == str(node_id) and value[1] == index:
+                return True
+    return False
 
 
 class BaseFlux:
-    RETURN_TYPES = ("IMAGE",)
-    FUNCTION = "generate_image"
+    RETURN_TYPES = ("IMAGE", RESULT_TYPE)
+    RETURN_NAMES = ("image", "result")
+    OUTPUT_TOOLTIPS = ("The decoded images.", "The images exactly as delivered by the API, for Save Result (BFL).")
+    FUNCTION = "run_async" if supports_async_nodes() else "run"
     CATEGORY = "BFL"
+    CHECK_MULTIPLE_OF_32 = True
+    # Re-encode results the API delivered in another format than output_format before decoding
+    REENCODE_ON_FORMAT_MISMATCH = False
+    POLLING_POLICY = None  # PollingPolicy overriding the per-endpoint default
+    # Optional IMAGE/MASK sockets, {socket name: ("IMAGE" or "MASK", request field)}. A connected socket is
+    # encoded at submit time and fills the field in place of the node's base64 string input.
+    TENSOR_INPUTS = {}
+    # Whether the endpoint accepts URLs for the TENSOR_INPUTS fields, so a configured image store can be used
+    IMAGE_URLS = False
+    INPUT_BUDGET = None  # InputBudget overriding the per-endpoint default
 
-    def process_result(self, result, output_format="jpeg"):
-        try:
-            sample_url = result["result"]["sample"]
-            img_response = requests.get(sample_url)
-            img = Image.open(io.BytesIO(img_response.content))
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        input_types = cls.__dict__.get("INPUT_TYPES")
+        if input_types is None:
+            return
+
+        def with_shared_inputs(klass):
+            types = input_types.__func__(klass)
+            tensor_inputs = {
+                name: (kind, {"tooltip": f"Optional {kind} input, encoded at submit time. Replaces '{field}'."})
+                for name, (kind, field) in klass.TENSOR_INPUTS.items()
+            }
+            return {
+                **types,
+                "optional": {**types.get("optional", {}), **tensor_inputs, **SHARED_INPUTS},
+                "hidden": {**types.get("hidden", {}), **HIDDEN_INPUTS},
+            }
+
+        cls.INPUT_TYPES = classmethod(with_shared_inputs)
+
+    @classmethod
+    def IS_CHANGED(cls, seed=-1, config=None, **inputs):
+        """Re-run random-seed requests every time; reuse fixed-seed ones until the inputs or config change."""
+        return generation_fingerprint(seed, config)
+
+    def _split_inputs(self, inputs):
+        node_inputs = {
+            k: v
+            for k, v in inputs.items()
+            if k not in SHARED_INPUTS and k not in self.TENSOR_INPUTS and k not in HIDDEN_INPUTS
+        }
+        options = {k: v for k, v in inputs.items() if k in SHARED_INPUTS}
+        options["keep_delivered"] = output_linked(
+            inputs.get("bfl_prompt"), inputs.get("bfl_node_id"), self.RETURN_TYPES.index(RESULT_TYPE)
+        )
+        tensors = {k: v for k, v in inputs.items() if k in self.TENSOR_INPUTS and v is not None}
+        if tensors:
+            options["tensor_inputs"] = tensors
+        return node_inputs, options
+
+    def run(self, **inputs):
+        """Blocking ComfyUI entry point, used on builds without async node support."""
+        node_inputs, options = self._split_inputs(inputs)
+        with node_run(**options):
+            return self.generate_image(**node_inputs)
+
+    async def run_async(self, **inputs):
+        """
+        Async ComfyUI entry point.
+
+        The node's own generate_image builds the request arguments as usual; under deferred execution
+        BaseFlux.generate_image returns the engine coroutine, which is awaited here so ComfyUI can run
+        other nodes while this one waits on the API.
+        """
+        node_inputs, options = self._split_inputs(inputs)
+        with node_run(deferred=True, **options):
+            outcome = self.generate_image(**node_inputs)
+        if asyncio.iscoroutine(outcome):
+            outcome = await outcome
+        return outcome
+
+    def download_result(self, result, decode=True, keep=True):
+        """
+        Stream the delivered image into the decoder, enforcing the download limits.
+
+        Chunks are fed to the decoder as they arrive and, with `keep`, appended to a single buffer, so the
+        encoded image is held at most once.
+
+        Returns:
+            (image, data): the decoded PIL image, or None when `decode` is False, and a bytearray of the
+            delivered bytes, or None when `keep` is False.
+        """
+        sample_url = result["result"]["sample"]
+        deadline = time.monotonic() + DOWNLOAD_DEADLINE
+        response = call_with_retry(
+            "GET", sample_url, "download", lambda: get_session().get(sample_url, stream=True, timeout=DOWNLOAD_TIMEOUT)
+        )
+        with response:
+            response.raise_for_status()
+
+            content_type = response.headers.get("Content-Type", "")
+            if content_type and not content_type.startswith(("image/", "application/octet-stream")):
+                raise ValueError(f"Unexpected content type '{content_type}' for result image")
+            content_length = int(response.headers.get("Content-Length") or 0)
+            if content_length > MAX_DOWNLOAD_BYTES:
+                raise ValueError(f"Result image is {content_length} bytes, limit is {MAX_DOWNLOAD_BYTES}")
+
+            parser = ImageFile.Parser() if decode else None
+            data = bytearray() if keep else None
+            received = 0
+            for chunk in response.iter_content(DOWNLOAD_CHUNK_SIZE):
+                received += len(chunk)
+                if received > MAX_DOWNLOAD_BYTES:
+                    raise ValueError(f"Result image exceeds the {MAX_DOWNLOAD_BYTES} byte limit")
+                if time.monotonic() > deadline:
+                    raise TimeoutError(f"Result download took longer than {DOWNLOAD_DEADLINE}s")
+                if data is not None:
+                    data += chunk
+                if parser is not None:
+                    parser.feed(chunk)
+
+            if content_length and not response.headers.get("Content-Encoding") and received != content_length:
+                raise ValueError(f"Result image truncated: got {received} of {content_length} bytes")
+        return (parser.close() if parser is not None else None), data
+
+    def decode_image(self, img, output_format="jpeg", dtype=torch.float32):
+        """
+        Convert the delivered image to a (1, H, W, 3) tensor in [0, 1] of `dtype`.
 
+        The image is decoded once into a uint8 array and scaled in a single pass. It is re-encoded to
+        `output_format` only when REENCODE_ON_FORMAT_MISMATCH is set and the API delivered another
+        format, so the tensor carries the compression of the requested format.
+        """
+        delivered = (img.format or "").lower()
+        requested = output_format.lower().replace("jpg", "jpeg")
+        if self.REENCODE_ON_FORMAT_MISMATCH and delivered and delivered != requested:
             with io.BytesIO() as output:
-                img.save(output, format=output_format.upper())
+                img.convert("RGB").save(output, format=requested.upper())
                 output.seek(0)
-                img_converted = Image.open(output)
-
-                img_array = np.array(img_converted).astype(np.float32) / 255.0
-                img_tensor = torch.from_numpy(img_array)[None,]
-                return (img_tensor,)
-        except KeyError as e:
-            print(f"KeyError: Missing expected key {e}")
-            return self.create_blank_image()
-        except Exception as e:
-            print(f"Error processing image result: {str(e)}")
-            return self.create_blank_image()
+                return self.decode_image(Image.open(output), output_format, dtype)
+
+        return (pil_to_tensor(img, dtype)[None,],)
+
+    def node_output(self, images, delivered=()):
+        """Node outputs: the IMAGE batch and the list of DeliveredImage for the result output."""
+        if delivered:
+            shape = "x".join(str(n) for n in images.shape)
+            delivered_bytes = sum(len(item.data) for item in delivered)
+            print(
+                f"[BFL] {type(self).__name__} output: IMAGE {shape} {str(images.dtype).replace('torch.', '')} "
+                f"{tensor_nbytes(images) / 2**20:.1f} MiB, result {delivered_bytes / 2**20:.1f} MiB"
+            )
+        return (images, list(delivered))
+
+    def blank_output(self):
+        return self.node_output(self.create_blank_image()[0])
 
     def create_blank_image(self):
         blank_img = Image.new("RGB", (512, 512), color="black")
@@ -49,111 +265,429 @@ class BaseFlux:
             raise ValueError(f"Width {width} and height {height} must be multiples of 32.")
 
     def post_request(self, url_path, arguments, config_override=None):
-        # Use ConfigLoader with optional config override
+        # Cached ConfigLoader for the optional override; the key travels only in this request's headers
         config_loader_instance = get_config_loader(config_override)
-        config_loader_instance.set_x_key()  # Ensure X_KEY is set in environment
 
         post_url = config_loader_instance.create_url(url_path)
         headers = {"x-key": config_loader_instance.get_x_key()}
 
-        session = requests.Session()
-        prepared = session.prepare_request(requests.Request("POST", post_url, json=arguments, headers=headers))
-        body = prepared.body.decode() if isinstance(prepared.body, bytes) else prepared.body
+        session = get_session()
+        body = JsonBody(arguments)
+        headers["Content-Type"] = "application/json"
+        prepared = session.prepare_request(requests.Request("POST", post_url, data=body, headers=headers))
         headers_str = " \\\n    ".join(f"-H '{k}: {v}'" for k, v in prepared.headers.items())
-        print(f"[BFL] curl -X POST '{prepared.url}' \\\n    {headers_str} \\\n    -d '{body}'")
+        print(f"[BFL] curl -X POST '{prepared.url}' \\\n    {headers_str} \\\n    -d '{body.preview()}'")
 
-        response = session.send(prepared, timeout=REQUEST_TIMEOUT)
+        response = call_with_retry("POST", post_url, url_path, lambda: session.send(prepared, timeout=REQUEST_TIMEOUT))
         print(f"[BFL] POST response: {response.status_code}")
 
         if response.status_code == 200:
-            task_id = response.json().get("id")
+            response_data = response.json()
+            task_id = response_data.get("id")
             print(f"[BFL] Task ID: {task_id}")
+            if task_id:
+                # Poll the host that accepted the task, which may be a regional one
+                remember_polling_url(task_id, trusted_polling_url(response_data.get("polling_url"), post_url, task_id))
             return task_id
+        elif response.status_code == 429:
+            print(f"[BFL] Rate limited: {response.text}")
+            raise RateLimitedError(parse_retry_after(response.headers.get("Retry-After")))
         else:
             print(f"[BFL] Error initiating request: {response.status_code}, {response.text}")
             return None
 
-    def get_result(self, task_id, output_format="jpeg", max_attempts=40, config_override=None):
-        # Use ConfigLoader with optional config override
-        config_loader_instance = get_config_loader(config_override)
+    def poll_once(self, task_id, get_url, headers, attempt, elapsed):
+        """
+        Poll a task once.
 
+        Returns:
+            (status, result): (Status.READY, result) when the image can be downloaded, a terminal Status
+            when the task failed, or (None, result) when the task should be polled again. result is None
+            when the poll itself failed.
+        """
+        try:
+            print(f"[BFL] Poll attempt {attempt} | elapsed {elapsed:.1f}s | GET {get_url}")
+            result_response = call_with_retry(
+                "GET", get_url, "get_result", lambda: get_session().get(get_url, headers=headers, timeout=POLL_TIMEOUT)
+            )
+            print(f"[BFL] Poll response: {result_response.status_code}")
+
+            if result_response.status_code != 200:
+                print(f"[BFL] HTTP error on attempt {attempt}: {result_response.status_code}, {result_response.text}")
+                return None, None
+
+            result = result_response.json()
+            status = result.get("status")
+            print(f"[BFL] Status: {status}")
+
+            if Status(status) == Status.READY:
+                print(f"[BFL] Task {task_id} ready after {elapsed:.1f}s — downloading image")
+                return Status.READY, result
+            elif Status(status) == Status.PENDING:
+                progress = result.get("progress")
+                progress_str = f" (progress {progress})" if progress is not None else ""
+                print(f"[BFL] Attempt {attempt}: pending{progress_str}")
+                return None, result
+            elif Status(status) in [Status.ERROR, Status.CONTENT_MODERATED, Status.REQUEST_MODERATED]:
+                print(f"[BFL] Terminal status '{status}' — stopping retries")
+                return Status(status), result
+            else:
+                print(f"[BFL] Unknown status '{status}' on attempt {attempt}")
+
+        except CircuitOpenError:
+            raise
+        except ValueError as e:
+            print(f"[BFL] JSON parsing error on attempt {attempt}: {str(e)}")
+        except Exception as e:
+            print(f"[BFL] Unexpected error on attempt {attempt}: {str(e)}")
+        return None, None
+
+    def polling_policy(self, url_path=None):
+        """Polling schedule for an endpoint: the class's POLLING_POLICY if set, else the per-endpoint default."""
+        return self.POLLING_POLICY or get_polling_policy(url_path)
+
+    def _poll_target(self, task_id, config_override):
+        config_loader_instance = get_config_loader(config_override)
         headers = {"x-key": config_loader_instance.get_x_key()}
-        get_url = config_loader_instance.create_url(f"get_result?id={task_id}")
-        attempt = 1
-        start_time = time.time()
-        print(f"[BFL] Polling task {task_id} (max {max_attempts} attempts, 5s interval)")
+        get_url = polling_url_for(task_id) or config_loader_instance.create_url(f"get_result?id={task_id}")
+        return get_url, headers
+
+    def track_task(self, task_id, config_override=None, max_attempts=None, url_path=None):
+        """Hand a submitted task to the shared poller. Returns a Future resolving to (status, result)."""
+        receiver = get_webhook_receiver()
+        delivered = receiver.take(task_id)
+        if delivered is not None:
+            future = Future()
+            future.set_result(delivered)
+            return future
+
+        policy = self.polling_policy(url_path)
+        if receiver.expects(task_id):
+            # Completion is pushed to the webhook receiver, polling only covers lost deliveries
+            policy = receiver.safety_net_policy(policy)
+        get_url, headers = self._poll_target(task_id, config_override)
+        poll = functools.partial(self.poll_once, task_id, get_url, headers)
+        future = get_poller().track(task_id, poll, policy, max_attempts)
+        future.add_done_callback(lambda _: receiver.forget(task_id))
+
+        # A delivery may have landed between take() and track()
+        delivered = receiver.take(task_id)
+        if delivered is not None:
+            get_poller().complete(task_id, *delivered)
+        return future
+
+    def prepare_arguments(self, arguments):
+        """Validate the request arguments and fill in defaults shared by every endpoint."""
+        if self.CHECK_MULTIPLE_OF_32 and "width" in arguments and "height" in arguments:
+            self.check_multiple_of_32(arguments["width"], arguments["height"])
+        return get_webhook_receiver().apply_defaults(arguments)
+
+    def input_budget(self, url_path=None):
+        """Input image limits for an endpoint: the class's INPUT_BUDGET if set, else the per-endpoint default."""
+        if not get_config_loader().get_bool("INPUT_BUDGET", "ENABLED", True):
+            return None
+        return self.INPUT_BUDGET or get_input_budget(url_path)
+
+    async def prepare_image_inputs(self, arguments, tensors, budget=None):
+        """
+        Fill the image fields from the connected IMAGE/MASK sockets and fit every image within `budget`.
+
+        Tensors are encoded straight to the budget; base64 strings are only re-encoded when they are over it.
+        All images are processed in parallel worker threads.
+        """
+        tensors = tensors or {}
+        jobs = {}
+        for name, tensor in tensors.items():
+            kind, field = self.TENSOR_INPUTS[name]
+            if arguments.get(field):
+                print(f"[BFL] Both a string and a tensor were given for '{field}', using the tensor")
+            jobs[field] = asyncio.to_thread(encode_tensor_input, kind, tensor, budget, field)
+        if budget is not None:
+            for _, field in self.TENSOR_INPUTS.values():
+                if field not in jobs and arguments.get(field):
+                    jobs[field] = asyncio.to_thread(fit_base64, arguments[field], budget, field)
+        if not jobs:
+            return arguments
+        values = await asyncio.gather(*jobs.values())
+        return {**arguments, **dict(zip(jobs, values, strict=True))}
 
-        while attempt <= max_attempts:
-            elapsed = time.time() - start_time
+    def accepts_image_urls(self, arguments):
+        return self.IMAGE_URLS
+
+    async def store_image_inputs(self, arguments):
+        """
+        Replace inline base64 images with URLs from the configured image store, in parallel.
+
+        Fields that already hold a URL are left alone. If the store fails, the image is sent inline.
+        """
+        store = get_image_store()
+        if store is None or not self.accepts_image_urls(arguments):
+            return arguments
+        fields = [
+            field
+            for field in dict.fromkeys(field for _, field in self.TENSOR_INPUTS.values())
+            if arguments.get(field) and not is_url(arguments[field])
+        ]
+
+        async def store_field(field):
             try:
-                print(f"[BFL] Poll attempt {attempt}/{max_attempts} | elapsed {elapsed:.1f}s | GET {get_url}")
-                result_response = requests.get(get_url, headers=headers, timeout=REQUEST_TIMEOUT)
-                print(f"[BFL] Poll response: {result_response.status_code}")
-
-                if result_response.status_code != 200:
-                    print(
-                        f"[BFL] HTTP error on attempt {attempt}/{max_attempts}: "
-                        f"{result_response.status_code}, {result_response.text}"
-                    )
-                    attempt += 1
-                    if attempt <= max_attempts:
-                        time.sleep(5)
-                    continue
-
-                result = result_response.json()
-                status = result.get("status")
-                print(f"[BFL] Status: {status}")
-
-                if Status(status) == Status.READY:
-                    print(f"[BFL] Task {task_id} ready after {elapsed:.1f}s — downloading image")
-                    return self.process_result(result, output_format=output_format)
-                elif Status(status) == Status.PENDING:
-                    print(f"[BFL] Attempt {attempt}/{max_attempts}: pending — retrying in 5s")
-                    attempt += 1
-                    if attempt <= max_attempts:
-                        time.sleep(5)
-                elif Status(status) in [Status.ERROR, Status.CONTENT_MODERATED, Status.REQUEST_MODERATED]:
-                    print(f"[BFL] Terminal status '{status}' — stopping retries")
-                    break
-                else:
-                    print(f"[BFL] Unknown status '{status}' on attempt {attempt}/{max_attempts}")
-                    attempt += 1
-                    if attempt <= max_attempts:
-                        time.sleep(5)
-
-            except ValueError as e:
-                print(f"[BFL] JSON parsing error on attempt {attempt}/{max_attempts}: {str(e)}")
-                attempt += 1
-                if attempt <= max_attempts:
-                    time.sleep(5)
+                return await asyncio.to_thread(store.put_base64, arguments[field])
             except Exception as e:
-                print(f"[BFL] Unexpected error on attempt {attempt}/{max_attempts}: {str(e)}")
-                attempt += 1
-                if attempt <= max_attempts:
-                    time.sleep(5)
-
-        elapsed = time.time() - start_time
-        print(
-            f"[BFL] All {max_attempts} attempts exhausted for task {task_id} "
-            f"after {elapsed:.1f}s — returning blank image."
-        )
-        return self.create_blank_image()
+                print(f"[BFL] Could not store '{field}', sending it inline: {str(e)}")
+                return arguments[field]
+
+        urls = await asyncio.gather(*(store_field(field) for field in fields))
+        return {**arguments, **dict(zip(fields, urls, strict=True))}
+
+    def task_submitted(self, task_id, arguments):
+        print(f"Task ID '{task_id}'")
+        get_webhook_receiver().expect(task_id, arguments.get("webhook_url"), arguments.get("webhook_secret"))
 
     def generate_image(self, url_path, arguments, config_override=None):
+        coroutine = self.generate_image_async(url_path, arguments, config_override, options=run_options())
+        if is_deferred():
+            return coroutine
+        return run_coroutine_sync(coroutine)
+
+    async def generate_image_async(self, url_path, arguments, config_override=None, options=None):
+        options = options or {}
         try:
-            if "width" in arguments and "height" in arguments:
-                self.check_multiple_of_32(arguments["width"], arguments["height"])
+            arguments = await self.prepare_image_inputs(
+                arguments, options.get("tensor_inputs"), self.input_budget(url_path)
+            )
+            # Cached results are keyed by the inline images: a stored image's URL can change on every run
+            key_arguments = arguments
+            arguments = await self.store_image_inputs(arguments)
+            arguments = self.prepare_arguments(arguments)
+        except Exception as e:
+            print(f"Error generating image: {str(e)}")
+            return self.blank_output()
 
-            task_id = self.post_request(url_path, arguments, config_override)
-            if task_id:
-                print(f"Task ID '{task_id}'")
-                return self.get_result(
-                    task_id, output_format=arguments.get("output_format", "jpeg"), config_override=config_override
-                )
-            return self.create_blank_image()
+        batch_size = options.get("batch_size", 1)
+        decode = options.get("decode", True)
+        dtype = resolve_output_dtype(options.get("output_dtype", "default"))
+        # Without decoding, the delivered bytes are the only output worth keeping
+        keep_delivered = options.get("keep_delivered", True) or not decode
+        if batch_size > 1:
+            return await self.generate_batch_async(
+                url_path,
+                arguments,
+                config_override,
+                batch_size,
+                options.get("batch_failure", "retry"),
+                decode,
+                dtype,
+                key_arguments,
+                keep_delivered,
+            )
+        fetched = await self.fetch_image_async(
+            url_path, arguments, config_override, decode, dtype, key_arguments, keep_delivered
+        )
+        if fetched is None:
+            return self.blank_output()
+        image, delivered = fetched
+        images = image[None,] if decode else self.undecoded_image()
+        return self.node_output(images, [delivered] if delivered is not None else [])
+
+    async def fetch_image_async(
+        self,
+        url_path,
+        arguments,
+        config_override=None,
+        decode=True,
+        dtype=torch.float32,
+        key_arguments=None,
+        keep_delivered=True,
+    ):
+        """
+        Submit one task and wait for its image, or take it from the result cache when enabled.
+
+        The cache key is computed from `key_arguments` when given: the arguments before image inputs were
+        replaced by image store URLs. With `keep_delivered` False (the result output is not connected) a
+        decoded download is not kept in memory, unless the result cache needs it.
+
+        Returns:
+            (image, delivered): the (H, W, 3) tensor of `dtype`, or None when `decode` is False, and the
+            DeliveredImage, or None when it was not kept.
+            None if any step failed.
+        """
+        cache = get_result_cache()
+        cache_key = request_key(url_path, key_arguments or arguments) if cache is not None else None
+        if cache_key is not None:
+            delivered = await asyncio.to_thread(cache.get, cache_key)
+            if delivered is not None:
+                task_id = delivered.metadata.get("task_id")
+                print(f"[BFL] Result cache hit for {url_path} (seed {arguments['seed']}, task {task_id})")
+                try:
+                    return await self.decode_delivered(delivered, arguments, decode, dtype)
+                except Exception as e:
+                    print(f"[BFL] Cached result unusable, generating again: {str(e)}")
+
+        admission = get_admission_controller(get_config_loader(config_override).get_x_key(), url_path)
+        try:
+            task_id = await self.submit_async(admission, url_path, arguments, config_override)
+        except Exception as e:
+            print(f"Error generating image: {str(e)}")
+            return None
+        if not task_id:
+            admission.release(success=False)
+            return None
+
+        status = None
+        try:
+            self.task_submitted(task_id, arguments)
+            deadline = time.monotonic() + self.polling_policy(url_path).timeout
+            future = self.track_task(task_id, config_override, url_path=url_path)
+            status, result = await asyncio.wrap_future(future)
         except Exception as e:
             print(f"Error generating image: {str(e)}")
-            return self.create_blank_image()
+            return None
+        finally:
+            # The task no longer counts against the account's active-task limit; only one the API finished
+            # (ready, failed or moderated) counts as a success for the adaptive limit
+            admission.release(success=status is not None)
+
+        try:
+            if status != Status.READY:
+                return None
+            keep = keep_delivered or cache_key is not None
+            img, data = await self.download_result_async(result, decode, deadline, keep)
+            delivered = self.delivered_image(data, url_path, task_id, arguments, result) if data is not None else None
+            if cache_key is not None:
+                await asyncio.to_thread(cache.put, cache_key, delivered)
+            if not keep_delivered:
+                delivered = None
+            if not decode:
+                return None, delivered
+            decoded = await asyncio.to_thread(self.decode_image, img, arguments.get("output_format", "jpeg"), dtype)
+            return decoded[0][0], delivered
+        except Exception as e:
+            print(f"Error generating image: {str(e)}")
+            return None
+
+    async def download_result_async(self, result, decode=True, deadline=None, keep=True):
+        """
+        download_result in a worker thread. While the download circuit is open, wait for it to let requests
+        through again, until `deadline` (time.monotonic()) at the latest.
+        """
+        while True:
+            try:
+                return await asyncio.to_thread(self.download_result, result, decode, keep)
+            except CircuitOpenError as e:
+                wait = min(e.retry_after, deadline - time.monotonic()) if deadline is not None else 0
+                if wait <= 0:
+                    raise
+                print(f"[BFL] {str(e)}, downloading again in {wait:.1f}s")
+                await asyncio.sleep(wait)
+
+    async def submit_async(self, admission, url_path, arguments, config_override=None):
+        """
+        Submit a task once the admission controller lets it through, resubmitting after 429s.
+
+        On success the in-flight slot stays taken and the caller must release it when the task is done.
+        """
+        for attempt in range(MAX_RATE_LIMIT_RETRIES + 1):
+            await admission.acquire_async()
+            try:
+                return await asyncio.to_thread(self.post_request, url_path, arguments, config_override)
+            except RateLimitedError as e:
+                admission.release(rate_limited=True, retry_after=e.retry_after)
+                if attempt == MAX_RATE_LIMIT_RETRIES:
+                    raise
+            except BaseException:
+                admission.release(success=False)
+                raise
+
+    async def decode_delivered(self, delivered, arguments, decode=True, dtype=torch.float32):
+        """Decode a DeliveredImage that did not come from a download, as fetch_image_async returns it."""
+        if not decode:
+            return None, delivered
+        img = Image.open(io.BytesIO(delivered.data))
+        decoded = await asyncio.to_thread(self.decode_image, img, arguments.get("output_format", "jpeg"), dtype)
+        return decoded[0][0], delivered
+
+    def delivered_image(self, data, url_path, task_id, arguments, result):
+        """Wrap the delivered bytes with the prompt, seed, endpoint and task id that produced them."""
+        sample = result.get("result") or {}
+        metadata = {
+            "prompt": arguments.get("prompt") or None,
+            "seed": sample.get("seed", arguments.get("seed")),
+            "endpoint": url_path,
+            "task_id": task_id,
+        }
+        return DeliveredImage(data, metadata)
+
+    def undecoded_image(self, count=1):
+        """Black stand-in for the IMAGE output when results are not decoded."""
+        return torch.zeros((count, UNDECODED_IMAGE_SIZE, UNDECODED_IMAGE_SIZE, 3), dtype=torch.float32)
+
+    async def generate_batch_async(
+        self,
+        url_path,
+        arguments,
+        config_override,
+        batch_size,
+        failure_policy="retry",
+        decode=True,
+        dtype=torch.float32,
+        key_arguments=None,
+        keep_delivered=True,
+    ):
+        """
+        Generate `batch_size` images concurrently and stack them into one (N, H, W, 3) batch.
+
+        Slot i uses seed + i when the arguments carry a seed. At most MAX_CONCURRENCY tasks (from the
+        [BATCH] section of config.ini) run at once. Failed slots are retried once, dropped, or replaced
+        by a black placeholder according to `failure_policy`. With `decode` off the IMAGE output is a
+        stand-in and only the delivered images are returned.
+        """
+        limit = asyncio.Semaphore(get_config_loader().get_int("BATCH", "MAX_CONCURRENCY", DEFAULT_BATCH_CONCURRENCY))
+        attempts = 2 if failure_policy == "retry" else 1
+
+        def with_slot_seed(slot_arguments, index):
+            if slot_arguments is None or "seed" not in slot_arguments:
+                return slot_arguments
+            return {**slot_arguments, "seed": slot_arguments["seed"] + index}
+
+        async def run_slot(index):
+            slot_arguments = with_slot_seed(arguments, index)
+            slot_key_arguments = with_slot_seed(key_arguments, index)
+            for attempt in range(attempts):
+                async with limit:
+                    fetched = await self.fetch_image_async(
+                        url_path, slot_arguments, config_override, decode, dtype, slot_key_arguments, keep_delivered
+                    )
+                if fetched is not None:
+                    return fetched
+                if attempt + 1 < attempts:
+                    print(f"[BFL] Batch slot {index + 1}/{batch_size} failed — retrying")
+            print(f"[BFL] Batch slot {index + 1}/{batch_size} failed")
+            return None
+
+        print(f"[BFL] Generating a batch of {batch_size} images on {url_path}")
+        fetched = await asyncio.gather(*(run_slot(i) for i in range(batch_size)))
+        delivered = [slot[1] for slot in fetched if slot is not None and slot[1] is not None]
+        if all(slot is None for slot in fetched):
+            return self.blank_output()
+        if not decode:
+            print(f"[BFL] Batch done: {len(delivered)}/{batch_size} images succeeded")
+            return self.node_output(self.undecoded_image(len(delivered)), delivered)
+
+        images = [slot[0] if slot is not None else None for slot in fetched]
+        succeeded = [image for image in images if image is not None]
+        height, width, channels = succeeded[0].shape
+        slots = images if failure_policy == "placeholder" else succeeded
+        batch = torch.zeros((len(slots), height, width, channels), dtype=succeeded[0].dtype)
+        for i, image in enumerate(slots):
+            if image is None:
+                continue
+            if image.shape != (height, width, channels):
+                image = torch.nn.functional.interpolate(
+                    image.float().movedim(-1, 0)[None,], size=(height, width), mode="bilinear", align_corners=False
+                )[0].movedim(0, -1)
+            batch[i] = image
+        print(f"[BFL] Batch done: {len(succeeded)}/{batch_size} images succeeded")
+        return self.node_output(batch, delivered)
 
 
 class BaseFinetuneFlux(BaseFlux):
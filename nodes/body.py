@@ -0,0 +1,52 @@
+import json
+import re
+
+CHUNK_SIZE = 64 * 1024
+INLINE_LIMIT = 1024  # strings longer than this are streamed, and abbreviated in previews
+_JSON_SAFE = re.compile(r"[A-Za-z0-9+/=:;,._-]*")  # base64 and data: URL characters, no JSON escaping needed
+
+
+class JsonBody:
+    """
+    Request body streaming the JSON encoding of a flat arguments dict.
+
+    Long strings such as base64 images are written to the socket in CHUNK_SIZE slices straight from the
+    arguments, so the body is never materialised as one big string or bytes object. The encoding is the
+    same as `json.dumps(arguments)`. The body can be iterated again for retries, and its exact length is
+    known up front, so requests sends it with a Content-Length instead of chunked encoding.
+    """
+
+    def __init__(self, arguments, chunk_size=CHUNK_SIZE):
+        self.chunk_size = chunk_size
+        self._parts = []
+        separator = "{"
+        for key, value in arguments.items():
+            prefix = f"{separator}{json.dumps(key)}: "
+            if isinstance(value, str) and len(value) > INLINE_LIMIT and _JSON_SAFE.fullmatch(value):
+                self._parts.append(f'{prefix}"'.encode())
+                self._parts.append(value)
+                self._parts.append(b'"')
+            else:
+                self._parts.append(f"{prefix}{json.dumps(value, allow_nan=False)}".encode())
+            separator = ", "
+        self._parts.append(b"{}" if separator == "{" else b"}")
+        # Streamed strings are ASCII, so their length in characters is their length in bytes
+        self._length = sum(len(part) for part in self._parts)
+
+    def __len__(self):
+        return self._length
+
+    def __iter__(self):
+        for part in self._parts:
+            if isinstance(part, bytes):
+                yield part
+            else:
+                for start in range(0, len(part), self.chunk_size):
+                    yield part[start : start + self.chunk_size].encode("ascii")
+
+    def preview(self):
+        """The body as text for logs, with streamed strings replaced by their size."""
+        return "".join(
+            part.decode() if isinstance(part, bytes) else f"<{len(part) / 1024:.0f} KiB of base64>"
+            for part in self._parts
+        )
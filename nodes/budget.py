@@ -0,0 +1,132 @@
+import io
+import math
+
+from PIL import Image
+
+from .image_store import decode_base64_image, is_url
+from .images import JPEG_QUALITY, encode_pil
+
+MIN_QUALITY = 70  # lowest JPEG/WebP quality tried before shrinking further to meet max_bytes
+SHRINK_STEP = 0.8  # scale applied per round while an encoding is still above max_bytes
+MB = 1024 * 1024
+
+
+class InputBudget:
+    """
+    Limits for the input images of an endpoint.
+
+    Images above `max_pixels` are downscaled (keeping the aspect ratio) and re-encoded as `image_format`.
+    If the encoding is still above `max_bytes`, the quality is lowered down to MIN_QUALITY and then the
+    image is shrunk further. Masks keep PNG and are resized with nearest-neighbour so their edges stay hard.
+
+    Args:
+        max_pixels: Largest width * height sent, or None for no limit.
+        max_bytes: Largest encoded size of one image, or None for no limit.
+        image_format: Format used for images that have to be re-encoded ("jpeg", "png" or "webp").
+        quality: Starting quality for JPEG/WebP re-encodes.
+    """
+
+    def __init__(self, max_pixels=None, max_bytes=None, image_format="jpeg", quality=JPEG_QUALITY):
+        self.max_pixels = max_pixels
+        self.max_bytes = max_bytes
+        self.image_format = image_format
+        self.quality = quality
+
+    def params(self):
+        return (self.max_pixels, self.max_bytes, self.image_format, self.quality)
+
+    def fit_size(self, width, height, scale=1.0):
+        if self.max_pixels and width * height > self.max_pixels:
+            scale *= math.sqrt(self.max_pixels / (width * height))
+        if scale >= 1.0:
+            return width, height
+        return max(int(width * scale), 1), max(int(height * scale), 1)
+
+    def fits(self, width, height, size):
+        return (not self.max_pixels or width * height <= self.max_pixels) and (
+            not self.max_bytes or size <= self.max_bytes
+        )
+
+    def fit(self, pil_image, mask=False):
+        """
+        Resize and encode a PIL image within the budget.
+
+        Returns:
+            (base64 string, reduced): reduced is True when the image was downscaled or its quality lowered.
+        """
+        image_format = "png" if mask else self.image_format
+        resample = Image.NEAREST if mask else Image.LANCZOS
+        lossy = image_format in ("jpeg", "webp")
+        scale = 1.0
+        quality = self.quality
+        while True:
+            size = self.fit_size(*pil_image.size, scale=scale)
+            resized = pil_image if size == pil_image.size else pil_image.resize(size, resample)
+            encoded = encode_pil(resized, image_format, **({"quality": quality} if lossy else {}))
+            if not self.max_bytes or encoded_size(encoded) <= self.max_bytes or min(size) <= 64:
+                return encoded, size != pil_image.size or quality != self.quality
+            if lossy and quality > MIN_QUALITY:
+                quality = max(quality - 10, MIN_QUALITY)
+            else:
+                scale *= SHRINK_STEP
+
+
+def encoded_size(value):
+    """Decoded byte size of a base64 string."""
+    return len(value) * 3 // 4
+
+
+def log_reduction(label, before_size, before_bytes, after):
+    width, height = before_size
+    before = f"{width}x{height}" + (f", {before_bytes / MB:.1f} MB" if before_bytes else "")
+    after_size = Image.open(io.BytesIO(decode_base64_image(after))).size
+    print(
+        f"[BFL] Input '{label}' reduced to fit the endpoint: {before} -> "
+        f"{after_size[0]}x{after_size[1]}, {encoded_size(after) / MB:.1f} MB"
+    )
+
+
+def fit_pil(pil_image, budget, label, mask=False):
+    """Encode a PIL image within `budget`, logging when it had to be reduced."""
+    encoded, reduced = budget.fit(pil_image, mask=mask)
+    if reduced:
+        log_reduction(label, pil_image.size, None, encoded)
+    return encoded
+
+
+def fit_base64(value, budget, label):
+    """Return a base64 image string within `budget`, re-encoding only when it is over. URLs are left alone."""
+    if is_url(value):
+        return value
+    data = decode_base64_image(value)
+    with Image.open(io.BytesIO(data)) as pil_image:
+        if budget.fits(*pil_image.size, len(data)):
+            return value
+        pil_image.load()
+        mask = pil_image.mode in ("1", "L") and pil_image.format == "PNG"
+        encoded, _ = budget.fit(pil_image, mask=mask)
+        log_reduction(label, pil_image.size, len(data), encoded)
+        return encoded
+
+
+# Per-endpoint budgets, matched by longest endpoint prefix. Endpoints whose output size or placement follows
+# the input pixels (Fill, Expand, Erase, Outpaint) have none, so their inputs are never resized.
+ENDPOINT_BUDGETS = {
+    "flux-kontext": InputBudget(max_pixels=2_100_000, max_bytes=10 * MB),
+    "flux-2": InputBudget(max_pixels=4_200_000, max_bytes=10 * MB),
+    "flux-tools/vto": InputBudget(max_pixels=4_200_000, max_bytes=10 * MB),
+}
+
+
+def register_input_budget(endpoint_prefix, budget):
+    """Set the input budget for every endpoint starting with `endpoint_prefix` (None to send inputs as they are)."""
+    ENDPOINT_BUDGETS[endpoint_prefix] = budget
+
+
+def get_input_budget(url_path):
+    """Return the input budget for an endpoint path such as "flux-kontext-pro", or None."""
+    if url_path:
+        matches = [prefix for prefix in ENDPOINT_BUDGETS if url_path.startswith(prefix)]
+        if matches:
+            return ENDPOINT_BUDGETS[max(matches, key=len)]
+    return None
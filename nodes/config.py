@@ -1,24 +1,61 @@
 import os
 import configparser
-from urllib.parse import urljoin
+import json
+import threading
+from collections import OrderedDict
+from types import MappingProxyType
+from urllib.parse import urljoin, urlsplit
+
+CONFIG_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "config.ini")
+MAX_CACHED_LOADERS = 32
+
+_file_config = (None, None)  # (file version, parsed config.ini)
+_file_lock = threading.Lock()
+_loaders = OrderedDict()
+_loaders_lock = threading.Lock()
+
+
+def _file_version():
+    try:
+        stat = os.stat(CONFIG_PATH)
+        return stat.st_mtime_ns, stat.st_size
+    except OSError:
+        return None
+
+
+def load_file_config():
+    """
+    Return (version, parser) for config.ini, re-reading the file only when its mtime or size changed.
+
+    The parser is shared by every ConfigLoader built from that version and must not be modified.
+    """
+    global _file_config
+    version = _file_version()
+    cached_version, parser = _file_config
+    if parser is not None and cached_version == version:
+        return _file_config
+    with _file_lock:
+        if _file_config[1] is None or _file_config[0] != version:
+            parser = configparser.ConfigParser()
+            parser.read(CONFIG_PATH)
+            _file_config = (version, parser)
+        return _file_config
+
 
 class ConfigLoader:
     def __init__(self, config_override=None):
         """
         Initialize ConfigLoader with optional config override.
         
+        The file-based config is the cached parse of config.ini, and the override is copied into a
+        read-only mapping, so a ConfigLoader never changes once built and can be shared between threads.
+        Prefer get_config_loader(), which reuses instances.
+
         Args:
             config_override: Optional dict with config values to override file-based config
         """
-        self.config_override = config_override
-        
-        # Load file-based config
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-        parent_dir = os.path.dirname(current_dir)
-        config_path = os.path.join(parent_dir, "config.ini")
-        self.config = configparser.ConfigParser()
-        self.config.read(config_path)
-        self.set_x_key()
+        self.config_override = MappingProxyType(dict(config_override)) if config_override else None
+        self.version, self.config = load_file_config()
         
         # Regional endpoints for finetuning (required by BFL API)
         self.regional_endpoints = {
@@ -41,6 +78,34 @@ class ConfigLoader:
         except KeyError:
             raise KeyError(f"{key} not found in section {section} of config file.")
 
+    def get_str(self, section, key, default=""):
+        """Get an optional string setting from the config file, falling back to a default."""
+        return self.config.get(section, key, fallback=default).strip()
+
+    def get_int(self, section, key, default):
+        """Get an optional integer setting from the config file, falling back to a default."""
+        try:
+            return self.config.getint(section, key, fallback=default)
+        except ValueError:
+            print(f"Warning: {key} in section {section} is not an integer, using {default}.")
+            return default
+
+    def get_float(self, section, key, default):
+        """Get an optional float setting from the config file, falling back to a default."""
+        try:
+            return self.config.getfloat(section, key, fallback=default)
+        except ValueError:
+            print(f"Warning: {key} in section {section} is not a number, using {default}.")
+            return default
+
+    def get_bool(self, section, key, default):
+        """Get an optional boolean setting from the config file, falling back to a default."""
+        try:
+            return self.config.getboolean(section, key, fallback=default)
+        except ValueError:
+            print(f"Warning: {key} in section {section} is not a boolean, using {default}.")
+            return default
+
     def create_url(self, path, region=None):
         """
         Create URL for API endpoints.
@@ -49,11 +114,17 @@ class ConfigLoader:
             path: API endpoint path
             region: Optional region for finetuning operations ("us" or "eu")
                    If provided, uses regional endpoint instead of global
+        
+        With MODE = auto in the [ROUTING] section, requests that are not pinned to a region
+        (no region given, not a finetune or get_result call) go to the fastest healthy host.
         """
         try:
             # Use region from config override if available and region not explicitly provided
             if not region and self.config_override and self.config_override.get("default_region"):
                 region = self.config_override["default_region"]
+
+            if not region:
+                region = self.route(path)
             
             if region and region in self.regional_endpoints:
                 base_url = self.regional_endpoints[region]
@@ -64,23 +135,50 @@ class ConfigLoader:
         except KeyError as e:
             raise KeyError(f"Error constructing URL: {str(e)}")
 
+    def route(self, path):
+        """Region picked by the latency-aware router for `path`, or None to use BASE_URL."""
+        # Imported here, routing reads its settings through ConfigLoader
+        from .routing import GLOBAL_HOST, get_region_router, is_routable
+
+        router = get_region_router()
+        if router is None or not is_routable(path):
+            return None
+        if urlsplit(self.get_key('API', 'BASE_URL')).hostname != GLOBAL_HOST:
+            return None
+        return router.best_region()
+
     def get_regional_endpoint(self, region):
         """Get the full regional endpoint URL for a given region."""
         if region not in self.regional_endpoints:
             raise ValueError(f"Invalid region '{region}'. Must be one of: {list(self.regional_endpoints.keys())}")
         return self.regional_endpoints[region]
 
-    def set_x_key(self):
-        """Set the X_KEY environment variable from config or override."""
-        try:
-            x_key = self.get_key('API', 'X_KEY')
-            os.environ["X_KEY"] = x_key
-        except KeyError as e:
-            print(f"Error: {str(e)}")
-    
     def get_x_key(self):
-        """Get the API key directly without setting environment variable."""
+        """Get the API key, to be sent as the x-key header of each request."""
         return self.get_key('API', 'X_KEY')
 
+
+def get_config_loader(config_override=None):
+    """
+    Get a ConfigLoader for an optional override, cached by the override's contents and the config.ini version.
+
+    Editing config.ini invalidates the cached instances on the next call.
+    """
+    key = json.dumps(config_override or {}, sort_keys=True, default=str)
+    version = load_file_config()[0]
+    with _loaders_lock:
+        loader = _loaders.get(key)
+        if loader is not None and loader.version == version:
+            _loaders.move_to_end(key)
+            return loader
+    loader = ConfigLoader(config_override)
+    with _loaders_lock:
+        _loaders[key] = loader
+        _loaders.move_to_end(key)
+        while len(_loaders) > MAX_CACHED_LOADERS:
+            _loaders.popitem(last=False)
+    return loader
+
+
 # Create a singleton instance to be shared across modules
-config_loader = ConfigLoader() 
\ No newline at end of file
+config_loader = ConfigLoader()
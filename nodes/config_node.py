@@ -1,4 +1,4 @@
-from .config import ConfigLoader
+from .config import get_config_loader as _get_cached_config_loader
 
 class FluxConfig_BFL:
     """
@@ -58,13 +58,15 @@ def get_config_loader(config_override=None):
     """
     Get a ConfigLoader instance with optional config override.
     
+    Instances are cached by the override's contents and reused until config.ini changes.
+
     Args:
         config_override: Optional config dict from FluxConfig_BFL node
         
     Returns:
         ConfigLoader instance
     """
-    return ConfigLoader(config_override)
+    return _get_cached_config_loader(config_override)
 
 
 # Node mappings for ComfyUI
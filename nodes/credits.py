@@ -0,0 +1,119 @@
+import asyncio
+import hashlib
+import json
+import threading
+import time
+from concurrent.futures import Future
+
+from .config import get_config_loader
+from .server_routes import json_response, register_route
+from .session import get_session
+
+DEFAULT_TTL = 30  # seconds a fetched balance is served without asking the API again
+DEFAULT_POLL_INTERVAL = 15  # seconds between refreshes of the live balance in the browser
+CREDITS_TIMEOUT = (10, 30)
+CREDITS_ROUTE = "/bfl/credits"
+
+
+class CreditsCache:
+    """
+    Cache of the /credits response per API key and host.
+
+    A fresh entry (younger than `ttl`) is returned as is. A stale one is returned immediately while a
+    background thread refreshes it. Concurrent fetches for the same key share one request.
+    """
+
+    def __init__(self, ttl=DEFAULT_TTL):
+        self.ttl = ttl
+        self._entries = {}  # key -> (fetched at, response JSON)
+        self._inflight = {}  # key -> Future of the running fetch
+        self._lock = threading.Lock()
+
+    def get(self, config_loader_instance, max_age=None):
+        """
+        Return (credits JSON, age in seconds) for a config's API key.
+
+        Raises:
+            RuntimeError: The API answered with an error and no earlier balance is cached.
+        """
+        url = config_loader_instance.create_url("credits")
+        x_key = config_loader_instance.get_x_key()
+        key = (url, hashlib.sha256(x_key.encode("utf-8")).hexdigest())
+        max_age = self.ttl if max_age is None else max_age
+
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is not None:
+            fetched_at, value = entry
+            age = time.monotonic() - fetched_at
+            if age > max_age:
+                threading.Thread(
+                    target=self._refresh_quietly, args=(key, url, x_key), name="bfl-credits", daemon=True
+                ).start()
+            return value, age
+        return self._refresh(key, url, x_key).result(), 0.0
+
+    def _refresh(self, key, url, x_key):
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is not None:
+                return future
+            future = self._inflight[key] = Future()
+        try:
+            value = self._fetch(url, x_key)
+            with self._lock:
+                self._entries[key] = (time.monotonic(), value)
+            future.set_result(value)
+        except Exception as e:
+            future.set_exception(e)
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+        return future
+
+    def _refresh_quietly(self, key, url, x_key):
+        error = self._refresh(key, url, x_key).exception()
+        if error is not None:
+            print(f"[BFL] Credits refresh failed: {str(error)}")
+
+    def _fetch(self, url, x_key):
+        response = get_session().get(url, headers={"x-key": x_key}, timeout=CREDITS_TIMEOUT)
+        if response.status_code != 200:
+            raise RuntimeError(f"Error {response.status_code}: {response.text}")
+        return response.json()
+
+
+def format_credits(value):
+    return json.dumps(value, indent=2)
+
+
+def register_server_routes():
+    """Serve the cached balance for the config.ini key at GET /bfl/credits on the running ComfyUI server."""
+
+    async def bfl_credits(request):
+        poll_interval = get_config_loader().get_float("CREDITS", "POLL_INTERVAL", DEFAULT_POLL_INTERVAL)
+        try:
+            value, age = await asyncio.to_thread(get_credits_cache().get, get_config_loader())
+        except Exception as e:
+            return json_response({"error": str(e), "poll_interval": poll_interval}, status=502)
+        return json_response({"text": format_credits(value), "age": round(age, 1), "poll_interval": poll_interval})
+
+    return register_route("GET", CREDITS_ROUTE, bfl_credits)
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_credits_cache():
+    """Return the process-wide CreditsCache, with the TTL from [CREDITS] in config.ini."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = CreditsCache(get_config_loader().get_float("CREDITS", "TTL", DEFAULT_TTL))
+    return _cache
+
+
+def setup():
+    register_server_routes()
@@ -0,0 +1,176 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from .config import get_config_loader
+from .server_routes import json_response, register_route
+
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
+
+DEFAULT_MEMORY_MB = 256
+DEFAULT_DISK_MB = 2048
+STATS_ROUTE = "/bfl/encode_cache"
+
+
+def tensor_digest(tensor, *params):
+    """Content hash of a tensor's bytes, shape and dtype plus any encode parameters."""
+    array = np.ascontiguousarray(tensor.detach().cpu().numpy())
+    hasher = xxhash.xxh3_128() if xxhash is not None else hashlib.blake2b(digest_size=16)
+    hasher.update(json.dumps([array.shape, str(array.dtype), params], sort_keys=True, default=str).encode("utf-8"))
+    hasher.update(memoryview(array).cast("B"))
+    return hasher.hexdigest()
+
+
+class EncodeCache:
+    """
+    Bounded LRU cache of base64-encoded images, keyed by tensor_digest().
+
+    Entries live in memory up to `memory_bytes`, and optionally in `disk_dir` up to `disk_bytes` so they
+    survive restarts. The least recently used entries are evicted first.
+    """
+
+    def __init__(
+        self, memory_bytes=DEFAULT_MEMORY_MB * 1024 * 1024, disk_dir="", disk_bytes=DEFAULT_DISK_MB * 1024 * 1024
+    ):
+        self.memory_bytes = memory_bytes
+        self.disk_dir = disk_dir
+        self.disk_bytes = disk_bytes
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    def get_or_encode(self, tensor, params, encode):
+        """Return the cached encoding of `tensor` with `params`, calling `encode()` on a miss."""
+        key = tensor_digest(tensor, *params)
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+
+        value = self._read_disk(key)
+        if value is None:
+            value = encode()
+            self._write_disk(key, value)
+            with self._lock:
+                self.misses += 1
+        else:
+            with self._lock:
+                self.disk_hits += 1
+        self._remember(key, value)
+        return value
+
+    def _remember(self, key, value):
+        if len(value) > self.memory_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                return
+            self._entries[key] = value
+            self._size += len(value)
+            while self._size > self.memory_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+
+    def _path(self, key):
+        return os.path.join(self.disk_dir, f"{key}.b64")
+
+    def _read_disk(self, key):
+        if not self.disk_dir:
+            return None
+        try:
+            with open(self._path(key), encoding="ascii") as f:
+                value = f.read()
+            os.utime(self._path(key))  # mark as recently used for eviction
+            return value
+        except OSError:
+            return None
+
+    def _write_disk(self, key, value):
+        if not self.disk_dir or len(value) > self.disk_bytes:
+            return
+        tmp_path = f"{self._path(key)}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="ascii") as f:
+                f.write(value)
+            os.replace(tmp_path, self._path(key))
+            self._evict_disk()
+        except OSError as e:
+            print(f"[BFL] Could not write encode cache entry: {str(e)}")
+
+    def _evict_disk(self):
+        files = []
+        for entry in os.scandir(self.disk_dir):
+            if entry.name.endswith(".b64"):
+                stat = entry.stat()
+                files.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.disk_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": round((self.hits + self.disk_hits) / lookups, 3) if lookups else 0.0,
+                "entries": len(self._entries),
+                "memory_bytes": self._size,
+            }
+
+
+def register_server_routes():
+    """Serve the cache counters at GET /bfl/encode_cache on the running ComfyUI server, if there is one."""
+
+    async def bfl_encode_cache(request):
+        cache = get_encode_cache()
+        return json_response(cache.stats() if cache is not None else {"enabled": False})
+
+    return register_route("GET", STATS_ROUTE, bfl_encode_cache)
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_encode_cache():
+    """Return the process-wide EncodeCache configured from [ENCODE_CACHE] in config.ini, or None when disabled."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                config = get_config_loader()
+                if not config.get_bool("ENCODE_CACHE", "ENABLED", True):
+                    _cache = False
+                else:
+                    _cache = EncodeCache(
+                        memory_bytes=config.get_int("ENCODE_CACHE", "MEMORY_MB", DEFAULT_MEMORY_MB) * 1024 * 1024,
+                        disk_dir=os.path.expanduser(config.get_str("ENCODE_CACHE", "DISK_DIR")),
+                        disk_bytes=config.get_int("ENCODE_CACHE", "DISK_MB", DEFAULT_DISK_MB) * 1024 * 1024,
+                    )
+    return _cache or None
+
+
+def setup():
+    register_server_routes()
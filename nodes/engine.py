@@ -0,0 +1,72 @@
+import asyncio
+import contextlib
+import contextvars
+import sys
+import threading
+
+from .config import get_config_loader
+
+# Options of the node run in progress, set by the BaseFlux entry points. "deferred" makes
+# BaseFlux.generate_image hand back a coroutine for the async entry point to await instead of
+# blocking the calling thread; the other keys are the shared inputs popped from the node's inputs.
+_run_options = contextvars.ContextVar("bfl_run_options", default=None)
+
+
+def supports_async_nodes():
+    """
+    Check whether the running ComfyUI can schedule coroutine node functions.
+
+    Builds with async node support await `async def` node functions and keep executing other ready
+    nodes in the meantime. Older builds call them synchronously, so the blocking entry point is used there.
+    Can be turned off with ASYNC_NODES = false in the [ENGINE] section of config.ini.
+    """
+    if not get_config_loader().get_bool("ENGINE", "ASYNC_NODES", True):
+        return False
+    execution = sys.modules.get("execution")
+    if execution is None:
+        try:
+            import execution
+        except ImportError:
+            return False
+    return hasattr(execution, "_async_map_node_over_list")
+
+
+@contextlib.contextmanager
+def node_run(**options):
+    """Make `options` visible to run_options() for the duration of a node's generate_image call."""
+    token = _run_options.set(options)
+    try:
+        yield
+    finally:
+        _run_options.reset(token)
+
+
+def run_options():
+    return _run_options.get() or {}
+
+
+def is_deferred():
+    return run_options().get("deferred", False)
+
+
+def run_coroutine_sync(coroutine):
+    """Run a coroutine to completion from synchronous code, even when called on an event loop thread."""
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coroutine)
+
+    outcome = {}
+
+    def _run():
+        try:
+            outcome["result"] = asyncio.run(coroutine)
+        except BaseException as e:
+            outcome["error"] = e
+
+    thread = threading.Thread(target=_run, name="bfl-sync-run")
+    thread.start()
+    thread.join()
+    if "error" in outcome:
+        raise outcome["error"]
+    return outcome["result"]
@@ -0,0 +1,278 @@
+import io
+import json
+import os
+import struct
+import zlib
+
+import torch
+from PIL import Image
+
+from .image_store import sniff_format
+from .images import pil_to_tensor, resolve_output_dtype, tensor_nbytes
+
+RESULT_TYPE = "BFL_RESULT"
+SOFTWARE = "BFL API"
+MAX_SEGMENT_BYTES = 65533  # largest payload of a JPEG marker segment
+MAX_DESCRIPTION_BYTES = 16384  # ASCII ImageDescription in the EXIF segment
+MAX_USER_COMMENT_CHARS = 10000  # UTF-16 UserComment, at most 40000 bytes, so the segment stays within the limit
+
+_EXTENSIONS = {"png": "png", "jpeg": "jpg", "webp": "webp"}
+
+
+class DeliveredImage:
+    """
+    A result image exactly as the API delivered it, with what produced it.
+
+    Args:
+        data: The delivered bytes.
+        metadata: Dict of prompt, seed, endpoint and task_id; None values are dropped.
+    """
+
+    def __init__(self, data, metadata):
+        self.data = data
+        self.metadata = {k: v for k, v in metadata.items() if v is not None}
+        self.image_format = sniff_format(data)
+
+    @property
+    def extension(self):
+        return _EXTENSIONS.get(self.image_format, "bin")
+
+    def size(self):
+        """(width, height) read from the image header, without decoding the pixels."""
+        try:
+            with Image.open(io.BytesIO(self.data)) as img:
+                return img.size
+        except Exception:
+            return 0, 0
+
+    def decode(self, dtype=torch.float32):
+        """Decode the delivered bytes to an (H, W, 3) tensor in [0, 1] of `dtype`."""
+        with Image.open(io.BytesIO(self.data)) as img:
+            return pil_to_tensor(img, dtype)
+
+    def with_metadata(self, extra_text=None):
+        """The delivered bytes with the metadata embedded, see embed_metadata()."""
+        return embed_metadata(self.data, self.image_format, self.metadata, extra_text)
+
+
+def _truncate(text, limit):
+    encoded = text.encode("utf-8")
+    if len(encoded) <= limit:
+        return encoded
+    return encoded[:limit].decode("utf-8", errors="ignore").encode("utf-8")
+
+
+def _png_text_chunk(keyword, text):
+    """tEXt chunk when the text is Latin-1, iTXt (UTF-8) otherwise, like PIL's PngInfo.add_text."""
+    try:
+        chunk_type, body = b"tEXt", keyword.encode("latin-1") + b"\0" + text.encode("latin-1")
+    except UnicodeEncodeError:
+        chunk_type, body = b"iTXt", keyword.encode("latin-1") + b"\0\0\0\0\0" + text.encode("utf-8")
+    crc = zlib.crc32(chunk_type + body) & 0xFFFFFFFF
+    return struct.pack(">I", len(body)) + chunk_type + body + struct.pack(">I", crc)
+
+
+def _embed_png(data, texts):
+    end = len(data) - 12
+    if data[end + 4 : end + 8] != b"IEND":
+        end = data.rfind(b"IEND") - 4
+        if end < 0:
+            return data
+    chunks = b"".join(_png_text_chunk(keyword, text) for keyword, text in texts.items())
+    return data[:end] + chunks + data[end:]
+
+
+def _ifd(entries, offset):
+    """Big-endian TIFF IFD of (tag, type, count, value) entries at `offset`, followed by its longer values."""
+    values_at = offset + 2 + 12 * len(entries) + 4
+    ifd, values = struct.pack(">H", len(entries)), b""
+    for tag, field_type, count, value in entries:
+        if len(value) <= 4:
+            ifd += struct.pack(">HHI", tag, field_type, count) + value.ljust(4, b"\0")
+        else:
+            ifd += struct.pack(">HHII", tag, field_type, count, values_at + len(values))
+            values += value + b"\0" * (len(value) % 2)  # values start on a word boundary
+    return ifd + struct.pack(">I", 0) + values
+
+
+def _exif_segment(description):
+    """
+    APP1 segment holding a minimal big-endian EXIF block: ImageDescription and Software in IFD0 and, for a
+    description that is not ASCII, the full text as a UNICODE (UTF-16) UserComment in the Exif IFD.
+
+    ImageDescription is an ASCII tag, so non-ASCII characters are written there as "?".
+    """
+    ascii_description = description.encode("ascii", errors="replace")[:MAX_DESCRIPTION_BYTES] + b"\0"
+    software = SOFTWARE.encode("ascii") + b"\0"
+    entries = [(0x010E, 2, len(ascii_description), ascii_description), (0x0131, 2, len(software), software)]
+    exif_ifd = b""
+    if not description.isascii():
+        comment = b"UNICODE\0" + description[:MAX_USER_COMMENT_CHARS].encode("utf-16-be")
+        entries.append((0x8769, 4, 1, b"\0" * 4))  # Exif IFD pointer, set below
+        exif_at = 8 + len(_ifd(entries, 8))
+        entries[-1] = (0x8769, 4, 1, struct.pack(">I", exif_at))
+        exif_ifd = _ifd([(0x9286, 7, len(comment), comment)], exif_at)
+    payload = b"Exif\0\0" + b"MM\0\x2a" + struct.pack(">I", 8) + _ifd(entries, 8) + exif_ifd
+    return b"\xff\xe1" + struct.pack(">H", len(payload) + 2) + payload
+
+
+def _comment_segment(text):
+    payload = _truncate(text, MAX_SEGMENT_BYTES)
+    return b"\xff\xfe" + struct.pack(">H", len(payload) + 2) + payload
+
+
+def _embed_jpeg(data, metadata):
+    # Insert after a leading JFIF APP0 segment, and keep an EXIF block the image already has
+    insert_at, pos, has_exif = 2, 2, False
+    while pos + 4 <= len(data) and data[pos] == 0xFF and 0xE0 <= data[pos + 1] <= 0xEF:
+        length = struct.unpack(">H", data[pos + 2 : pos + 4])[0]
+        if data[pos + 1] == 0xE0 and pos == 2:
+            insert_at = pos + 2 + length
+        if data[pos + 1] == 0xE1 and data[pos + 4 : pos + 10] == b"Exif\0\0":
+            has_exif = True
+        pos += 2 + length
+    segments = b""
+    if not has_exif and metadata.get("prompt"):
+        segments += _exif_segment(metadata["prompt"])
+    segments += _comment_segment(json.dumps(metadata, ensure_ascii=False))
+    return data[:insert_at] + segments + data[insert_at:]
+
+
+def embed_metadata(data, image_format, metadata, extra_text=None):
+    """
+    Embed generation metadata into encoded image bytes without re-encoding the pixels.
+
+    PNG gets text chunks: Description (the prompt), Software, "bfl" (the metadata as JSON) and any
+    `extra_text` keywords. JPEG gets an EXIF ImageDescription and Software, unless it already carries EXIF,
+    plus a comment segment with the metadata as JSON. The EXIF ImageDescription is ASCII; a non-ASCII prompt is
+    also written in full as a UTF-16 UserComment. Other formats are returned unchanged.
+    """
+    if image_format == "png":
+        texts = {"Software": SOFTWARE, "bfl": json.dumps(metadata, ensure_ascii=False)}
+        if metadata.get("prompt"):
+            texts["Description"] = metadata["prompt"]
+        return _embed_png(data, {**texts, **(extra_text or {})})
+    if image_format == "jpeg":
+        return _embed_jpeg(data, metadata)
+    return data
+
+
+def _comfy_metadata(prompt, extra_pnginfo):
+    """ComfyUI's prompt and workflow text chunks, as SaveImage writes them, unless metadata is disabled."""
+    try:
+        from comfy.cli_args import args
+
+        if args.disable_metadata:
+            return {}
+    except ImportError:
+        pass
+    texts = {}
+    if prompt is not None:
+        texts["prompt"] = json.dumps(prompt)
+    for key, value in (extra_pnginfo or {}).items():
+        texts[key] = json.dumps(value)
+    return texts
+
+
+class SaveBFLResult:
+    """Write result images to the output directory exactly as the API delivered them."""
+
+    @classmethod
+    def INPUT_TYPES(cls):
+        return {
+            "required": {
+                "result": (RESULT_TYPE, {"tooltip": "The result output of a BFL generation node."}),
+                "filename_prefix": ("STRING", {"default": "BFL"}),
+            },
+            "optional": {
+                "embed_metadata": (
+                    "BOOLEAN",
+                    {
+                        "default": True,
+                        "tooltip": (
+                            "Embed prompt, seed, endpoint and task id as PNG text chunks or JPEG EXIF/comment. "
+                            "The pixels are never re-encoded."
+                        ),
+                    },
+                ),
+            },
+            "hidden": {"prompt": "PROMPT", "extra_pnginfo": "EXTRA_PNGINFO"},
+        }
+
+    RETURN_TYPES = ()
+    FUNCTION = "save"
+    OUTPUT_NODE = True
+    CATEGORY = "BFL/Utils"
+
+    def save(self, result, filename_prefix="BFL", embed_metadata=True, prompt=None, extra_pnginfo=None):
+        import folder_paths
+
+        if not result:
+            print("[BFL] No delivered images to save")
+            return {"ui": {"images": []}}
+
+        width, height = result[0].size()
+        full_output_folder, filename, counter, subfolder, filename_prefix = folder_paths.get_save_image_path(
+            filename_prefix, folder_paths.get_output_directory(), width, height
+        )
+        comfy_texts = _comfy_metadata(prompt, extra_pnginfo) if embed_metadata else {}
+        images = []
+        for delivered in result:
+            data = delivered.with_metadata(comfy_texts) if embed_metadata else delivered.data
+            file = f"{filename}_{counter:05}_.{delivered.extension}"
+            with open(os.path.join(full_output_folder, file), "wb") as f:
+                f.write(data)
+            print(f"[BFL] Saved {file} ({len(data) / 1024:.0f} KiB, as delivered)")
+            images.append({"filename": file, "subfolder": subfolder, "type": "output"})
+            counter += 1
+        return {"ui": {"images": images}}
+
+
+class DecodeBFLResult:
+    """Decode a result output into an IMAGE batch where pixels are needed, e.g. after a node run with decode off."""
+
+    @classmethod
+    def INPUT_TYPES(cls):
+        return {
+            "required": {
+                "result": (RESULT_TYPE, {"tooltip": "The result output of a BFL generation node."}),
+            },
+            "optional": {
+                "output_dtype": (
+                    ["default", "float32", "float16"],
+                    {"default": "default", "tooltip": "Precision of the IMAGE output, see the generation nodes."},
+                ),
+            },
+        }
+
+    RETURN_TYPES = ("IMAGE",)
+    FUNCTION = "decode"
+    CATEGORY = "BFL/Utils"
+
+    def decode(self, result, output_dtype="default"):
+        dtype = resolve_output_dtype(output_dtype)
+        if not result:
+            return (torch.zeros((1, 64, 64, 3), dtype=dtype),)
+
+        images = [delivered.decode(dtype) for delivered in result]
+        height, width, channels = images[0].shape
+        batch = torch.empty((len(images), height, width, channels), dtype=dtype)
+        for i, image in enumerate(images):
+            if image.shape != (height, width, channels):
+                image = torch.nn.functional.interpolate(
+                    image.float().movedim(-1, 0)[None,], size=(height, width), mode="bilinear", align_corners=False
+                )[0].movedim(0, -1)
+            batch[i] = image
+        print(f"[BFL] Decoded {len(images)} result image(s): {tensor_nbytes(batch) / 2**20:.1f} MiB")
+        return (batch,)
+
+
+NODE_CLASS_MAPPINGS = {
+    "SaveBFLResult_BFL": SaveBFLResult,
+    "DecodeBFLResult_BFL": DecodeBFLResult,
+}
+
+NODE_DISPLAY_NAME_MAPPINGS = {
+    "SaveBFLResult_BFL": "Save Result (BFL)",
+    "DecodeBFLResult_BFL": "Decode Result (BFL)",
+}
@@ -1,7 +1,11 @@
-import requests
 import json
 from .base import BaseFinetuneFlux
 from .config_node import get_config_loader
+from .finetune_catalog import FinetuneAPIError, finetune_ids, get_finetune_catalog
+from .fingerprint import INVENTORY_TTL, STATUS_TTL, ttl_fingerprint
+from .session import get_session
+
+REQUEST_TIMEOUT = (10, 30)  # seconds for connect, and for the response to a status or delete call
 
 
 class FluxFinetuneStatus:
@@ -20,6 +24,10 @@ class FluxFinetuneStatus:
             }
         }
 
+    @classmethod
+    def IS_CHANGED(cls, finetune_id="", config=None):
+        return ttl_fingerprint(STATUS_TTL, config)
+
     def check_finetune_status(self, finetune_id, config=None):
         if not finetune_id or not finetune_id.strip():
             error_response = {"error": "No finetune ID provided"}
@@ -27,7 +35,6 @@ class FluxFinetuneStatus:
 
         try:
             config_loader_instance = get_config_loader(config)
-            config_loader_instance.set_x_key()
             polling_url = config_loader_instance.create_url("get_result")
 
             headers = {"x-key": config_loader_instance.get_x_key()}
@@ -36,7 +43,7 @@ class FluxFinetuneStatus:
             print(f"🔍 Checking finetune status for ID: {finetune_id}")
             print(f"📡 Using endpoint: {polling_url}")
 
-            response = requests.get(polling_url, headers=headers, params=params)
+            response = get_session().get(polling_url, headers=headers, params=params, timeout=REQUEST_TIMEOUT)
 
             if response.status_code == 200:
                 result = response.json()
@@ -79,34 +86,35 @@ class FluxMyFinetunes:
         return {
             "required": {},
             "optional": {
+                "include_details": ("BOOLEAN", {
+                    "default": False,
+                    "tooltip": "Output the details of every finetune, fetched concurrently, instead of the id list"
+                }),
                 "config": ("BFL_CONFIG",)
             }
         }
 
-    def get_my_finetunes(self, config=None):
+    @classmethod
+    def IS_CHANGED(cls, include_details=False, config=None):
+        return f"{ttl_fingerprint(INVENTORY_TTL, config)}:{get_finetune_catalog().version}"
+
+    def get_my_finetunes(self, include_details=False, config=None):
         try:
             config_loader_instance = get_config_loader(config)
-            config_loader_instance.set_x_key()
-            my_finetunes_url = config_loader_instance.create_url("my_finetunes")
-
-            headers = {"x-key": config_loader_instance.get_x_key()}
+            catalog = get_finetune_catalog()
 
             print(f"📋 Getting my finetunes")
-            print(f"📡 Using endpoint: {my_finetunes_url}")
+            print(f"📡 Using endpoint: {config_loader_instance.create_url('my_finetunes')}")
 
-            response = requests.get(my_finetunes_url, headers=headers)
+            result = catalog.list_finetunes(config_loader_instance)
+            print(f"✅ Found {len(finetune_ids(result))} finetunes")
+            if include_details:
+                result = catalog.all_details(config_loader_instance, finetune_ids(result))
+            return (json.dumps(result, indent=2),)
 
-            if response.status_code == 200:
-                result = response.json()
-                print(f"✅ Found {len(result) if isinstance(result, list) else 'N/A'} finetunes")
-                return (json.dumps(result, indent=2),)
-            else:
-                print(f"❌ Error getting finetunes: {response.status_code}")
-                try:
-                    error_response = response.json()
-                    return (json.dumps(error_response, indent=2),)
-                except:
-                    return (f"HTTP {response.status_code}: {response.text}",)
+        except FinetuneAPIError as e:
+            print(f"❌ Error getting finetunes: {e.status_code}")
+            return (e.text,)
 
         except Exception as e:
             print(f"❌ Exception getting finetunes: {str(e)}")
@@ -129,34 +137,27 @@ class FluxFinetuneDetails:
             }
         }
 
+    @classmethod
+    def IS_CHANGED(cls, finetune_id="", config=None):
+        return f"{ttl_fingerprint(INVENTORY_TTL, config)}:{get_finetune_catalog().version}"
+
     def get_finetune_details(self, finetune_id, config=None):
         if not finetune_id or not finetune_id.strip():
             return ("Error: Finetune ID is required",)
 
         try:
             config_loader_instance = get_config_loader(config)
-            config_loader_instance.set_x_key()
-            details_url = config_loader_instance.create_url("finetune_details")
-
-            headers = {"x-key": config_loader_instance.get_x_key()}
-            params = {"finetune_id": finetune_id.strip()}
 
             print(f"📋 Getting finetune details for ID: {finetune_id}")
-            print(f"📡 Using endpoint: {details_url}")
+            print(f"📡 Using endpoint: {config_loader_instance.create_url('finetune_details')}")
 
-            response = requests.get(details_url, headers=headers, params=params)
+            result = get_finetune_catalog().details(config_loader_instance, finetune_id.strip())
+            print(f"✅ Got finetune details successfully")
+            return (json.dumps(result, indent=2),)
 
-            if response.status_code == 200:
-                result = response.json()
-                print(f"✅ Got finetune details successfully")
-                return (json.dumps(result, indent=2),)
-            else:
-                print(f"❌ Error getting finetune details: {response.status_code}")
-                try:
-                    error_response = response.json()
-                    return (json.dumps(error_response, indent=2),)
-                except:
-                    return (f"HTTP {response.status_code}: {response.text}",)
+        except FinetuneAPIError as e:
+            print(f"❌ Error getting finetune details: {e.status_code}")
+            return (e.text,)
 
         except Exception as e:
             print(f"❌ Exception getting finetune details: {str(e)}")
@@ -179,13 +180,17 @@ class FluxDeleteFinetune:
             }
         }
 
+    @classmethod
+    def IS_CHANGED(cls, finetune_id="", config=None):
+        # Deleting is an action, never served from the cache
+        return float("nan")
+
     def delete_finetune(self, finetune_id, config=None):
         if not finetune_id or not finetune_id.strip():
             return ("Error: Finetune ID is required",)
 
         try:
             config_loader_instance = get_config_loader(config)
-            config_loader_instance.set_x_key()
             delete_url = config_loader_instance.create_url("delete_finetune")
 
             headers = {
@@ -197,11 +202,12 @@ class FluxDeleteFinetune:
             print(f"🗑️  Deleting finetune ID: {finetune_id}")
             print(f"📡 Using endpoint: {delete_url}")
 
-            response = requests.post(delete_url, headers=headers, json=payload)
+            response = get_session().post(delete_url, headers=headers, json=payload, timeout=REQUEST_TIMEOUT)
 
             if response.status_code == 200:
                 result = response.json()
                 print(f"✅ Finetune deleted successfully")
+                get_finetune_catalog().invalidate(finetune_id.strip())
                 return (json.dumps(result, indent=2),)
             else:
                 print(f"❌ Error deleting finetune: {response.status_code}")
@@ -216,6 +222,14 @@ class FluxDeleteFinetune:
             return (f"Error: {str(e)}",)
 
 
+def finetune_choice():
+    """Optional dropdown of the account's finetune ids, filled from the finetune catalogue cache."""
+    return (["none", *get_finetune_catalog().cached_ids()], {
+        "default": "none",
+        "tooltip": "Pick one of your finetunes (config.ini key). Overrides finetune_id unless 'none'."
+    })
+
+
 class FluxProFillFinetune(BaseFinetuneFlux):
     @classmethod
     def INPUT_TYPES(cls):
@@ -231,6 +245,7 @@ class FluxProFillFinetune(BaseFinetuneFlux):
                 "output_format": (["jpeg", "png"], {"default": "jpeg"})
             },
             "optional": {
+                "finetune": finetune_choice(),
                 "mask": ("STRING", {"default": ""}),
                 "prompt": ("STRING", {"default": "", "multiline": True}),
                 "seed": ("INT", {"default": -1}),
@@ -240,9 +255,16 @@ class FluxProFillFinetune(BaseFinetuneFlux):
             }
         }
 
+    @classmethod
+    def VALIDATE_INPUTS(cls, finetune="none"):
+        # The dropdown follows the live catalogue, so a saved id may be missing from it until it refreshes
+        return True
+
     def generate_image(self, finetune_id, image, finetune_strength, steps, prompt_upsampling, guidance,
-                       safety_tolerance, output_format, mask="", prompt="", seed=-1,
+                       safety_tolerance, output_format, finetune="none", mask="", prompt="", seed=-1,
                        webhook_url="", webhook_secret="", config=None):
+        if finetune and finetune != "none":
+            finetune_id = finetune
         arguments = {
             "finetune_id": finetune_id,
             "image": image,
@@ -280,6 +302,7 @@ class FluxPro11UltraFinetune(BaseFinetuneFlux):
                 "raw": ("BOOLEAN", {"default": False})
             },
             "optional": {
+                "finetune": finetune_choice(),
                 "seed": ("INT", {"default": -1}),
                 "image_prompt": ("STRING", {"default": ""}),
                 "image_prompt_strength": ("FLOAT", {"default": 0.1, "min": 0.0, "max": 1.0}),
@@ -290,9 +313,16 @@ class FluxPro11UltraFinetune(BaseFinetuneFlux):
             }
         }
 
+    @classmethod
+    def VALIDATE_INPUTS(cls, finetune="none"):
+        # The dropdown follows the live catalogue, so a saved id may be missing from it until it refreshes
+        return True
+
     def generate_image(self, finetune_id, prompt, finetune_strength, aspect_ratio, safety_tolerance,
-                       output_format, raw, seed=-1, image_prompt="", image_prompt_strength=0.1,
+                       output_format, raw, finetune="none", seed=-1, image_prompt="", image_prompt_strength=0.1,
                        prompt_upsampling=False, webhook_url="", webhook_secret="", config=None):
+        if finetune and finetune != "none":
+            finetune_id = finetune
         arguments = {
             "finetune_id": finetune_id,
             "prompt": prompt,
@@ -312,30 +342,8 @@ class FluxPro11UltraFinetune(BaseFinetuneFlux):
             arguments["webhook_url"] = webhook_url
         if webhook_secret:
             arguments["webhook_secret"] = webhook_secret
-        return self.generate_regional_image("flux-pro-1.1-ultra-finetuned", arguments, config)
-
-    def generate_regional_image(self, endpoint, arguments, config_override=None):
-        try:
-            config_loader_instance = get_config_loader(config_override)
-            config_loader_instance.set_x_key()
-
-            post_url = config_loader_instance.create_url(endpoint)
-            headers = {"x-key": config_loader_instance.get_x_key()}
-            print(f"[BFL] POST {post_url}")
-            response = requests.post(post_url, json=arguments, headers=headers, timeout=30)
-            print(f"[BFL] POST response: {response.status_code}")
-
-            if response.status_code == 200:
-                task_id = response.json().get("id")
-                if task_id:
-                    print(f"[BFL] Finetune Task ID: {task_id} — endpoint: {post_url}")
-                    return self.get_result(task_id, output_format=arguments.get("output_format", "jpeg"), config_override=config_override)
-            else:
-                print(f"[BFL] Error initiating regional finetune request: {response.status_code}, {response.text}")
-                return self.create_blank_image()
-        except Exception as e:
-            print(f"[BFL] Error generating regional finetune image: {str(e)}")
-            return self.create_blank_image()
+        # create_url applies the config's default_region, so finetunes pinned to a region are reached there
+        return super().generate_image("flux-pro-1.1-ultra-finetuned", arguments, config)
 
 
 NODE_CLASS_MAPPINGS = {
@@ -0,0 +1,195 @@
+import hashlib
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from .config import get_config_loader
+from .session import get_session
+
+DEFAULT_LIST_TTL = 60  # seconds the finetune list is served without revalidating
+DEFAULT_DETAILS_TTL = 600  # seconds finetune details are served without revalidating
+DEFAULT_WORKERS = 8  # finetune_details requests in flight at once
+CATALOG_TIMEOUT = (10, 30)
+# X_KEY values of an unconfigured install: the config.ini default and the README example
+PLACEHOLDER_KEYS = {"", "your-key", "your_api_key"}
+
+
+class FinetuneAPIError(Exception):
+    """A finetune management call answered with an error; `text` is what the nodes output for it."""
+
+    def __init__(self, response):
+        try:
+            text = json.dumps(response.json(), indent=2)
+        except ValueError:
+            text = f"HTTP {response.status_code}: {response.text}"
+        super().__init__(text)
+        self.status_code = response.status_code
+        self.text = text
+
+
+class _Entry:
+    def __init__(self, value, etag, last_modified):
+        self.value = value
+        self.etag = etag
+        self.last_modified = last_modified
+        self.fetched_at = time.monotonic()
+
+
+def finetune_ids(listing):
+    """Finetune ids of a my_finetunes response ({"finetunes": [...]} or a bare list)."""
+    if isinstance(listing, dict):
+        listing = listing.get("finetunes", [])
+    return [item if isinstance(item, str) else item.get("finetune_id", item.get("id")) for item in listing or []]
+
+
+class FinetuneCatalog:
+    """
+    Cache of the finetune list and finetune details per API key and host.
+
+    Entries are served for their TTL, then revalidated with If-None-Match / If-Modified-Since when the API
+    sent an ETag or Last-Modified, so an unchanged entry costs a 304 instead of a full response. Details of
+    many finetunes are fetched concurrently over the shared session. `version` changes on invalidation, so
+    node fingerprints can follow it.
+    """
+
+    def __init__(self, list_ttl=DEFAULT_LIST_TTL, details_ttl=DEFAULT_DETAILS_TTL, workers=DEFAULT_WORKERS):
+        self.list_ttl = list_ttl
+        self.details_ttl = details_ttl
+        self.workers = workers
+        self.version = 0
+        self._entries = {}
+        self._refreshing = set()
+        self._lock = threading.Lock()
+
+    def _account(self, config_loader_instance, url):
+        x_key = config_loader_instance.get_x_key()
+        return urlsplit(url).netloc, hashlib.sha256(x_key.encode("utf-8")).hexdigest()[:16]
+
+    def _get(self, key, url, x_key, ttl, params=None):
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is not None and time.monotonic() - entry.fetched_at <= ttl:
+            return entry.value
+
+        headers = {"x-key": x_key}
+        if entry is not None and entry.etag:
+            headers["If-None-Match"] = entry.etag
+        if entry is not None and entry.last_modified:
+            headers["If-Modified-Since"] = entry.last_modified
+        response = get_session().get(url, headers=headers, params=params, timeout=CATALOG_TIMEOUT)
+        if response.status_code == 304 and entry is not None:
+            entry.fetched_at = time.monotonic()
+            return entry.value
+        if response.status_code != 200:
+            raise FinetuneAPIError(response)
+        entry = _Entry(response.json(), response.headers.get("ETag"), response.headers.get("Last-Modified"))
+        with self._lock:
+            self._entries[key] = entry
+        return entry.value
+
+    def list_finetunes(self, config_loader_instance):
+        """The my_finetunes response for a config's API key."""
+        url = config_loader_instance.create_url("my_finetunes")
+        key = ("list", *self._account(config_loader_instance, url))
+        return self._get(key, url, config_loader_instance.get_x_key(), self.list_ttl)
+
+    def details(self, config_loader_instance, finetune_id):
+        """The finetune_details response for one finetune."""
+        url = config_loader_instance.create_url("finetune_details")
+        key = ("details", *self._account(config_loader_instance, url), finetune_id)
+        return self._get(
+            key, url, config_loader_instance.get_x_key(), self.details_ttl, params={"finetune_id": finetune_id}
+        )
+
+    def all_details(self, config_loader_instance, ids=None):
+        """
+        Details of `ids` (default: every finetune of the account), fetched concurrently.
+
+        Returns:
+            Dict of finetune id to its details, or to {"error": ...} when that fetch failed.
+        """
+        if ids is None:
+            ids = finetune_ids(self.list_finetunes(config_loader_instance))
+
+        def fetch(finetune_id):
+            try:
+                return self.details(config_loader_instance, finetune_id)
+            except FinetuneAPIError as e:
+                return {"error": e.text}
+            except Exception as e:
+                return {"error": str(e)}
+
+        if not ids:
+            return {}
+        with ThreadPoolExecutor(max_workers=min(len(ids), self.workers), thread_name_prefix="bfl-finetunes") as pool:
+            return dict(zip(ids, pool.map(fetch, ids), strict=True))
+
+    def cached_ids(self):
+        """
+        Finetune ids of the config.ini key from the cache, without waiting on the API.
+
+        A missing or stale list is refreshed in the background, so it shows up on the next call. Nothing is
+        requested while X_KEY is empty or still a placeholder.
+        """
+        config_loader_instance = get_config_loader()
+        try:
+            if config_loader_instance.get_x_key().strip().lower() in PLACEHOLDER_KEYS:
+                return []
+            url = config_loader_instance.create_url("my_finetunes")
+            key = ("list", *self._account(config_loader_instance, url))
+        except KeyError:
+            return []
+        with self._lock:
+            entry = self._entries.get(key)
+            stale = entry is None or time.monotonic() - entry.fetched_at > self.list_ttl
+            refresh = stale and key not in self._refreshing
+            if refresh:
+                self._refreshing.add(key)
+        if refresh:
+            threading.Thread(
+                target=self._refresh_list, args=(config_loader_instance, key), name="bfl-finetunes", daemon=True
+            ).start()
+        return finetune_ids(entry.value) if entry is not None else []
+
+    def _refresh_list(self, config_loader_instance, key):
+        try:
+            self.list_finetunes(config_loader_instance)
+        except Exception as e:
+            print(f"[BFL] Could not list finetunes: {str(e)}")
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def invalidate(self, finetune_id=None):
+        """Forget every cached list, and the details of `finetune_id` (all details when None)."""
+        with self._lock:
+            for key in list(self._entries):
+                if key[0] == "list" or finetune_id is None or key[-1] == finetune_id:
+                    del self._entries[key]
+            self.version += 1
+
+
+_catalog = None
+_catalog_lock = threading.Lock()
+
+
+def get_finetune_catalog():
+    """Return the process-wide FinetuneCatalog, configured from [FINETUNES] in config.ini."""
+    global _catalog
+    if _catalog is None:
+        with _catalog_lock:
+            if _catalog is None:
+                config = get_config_loader()
+                _catalog = FinetuneCatalog(
+                    list_ttl=config.get_float("FINETUNES", "LIST_TTL", DEFAULT_LIST_TTL),
+                    details_ttl=config.get_float("FINETUNES", "DETAILS_TTL", DEFAULT_DETAILS_TTL),
+                    workers=config.get_int("FINETUNES", "WORKERS", DEFAULT_WORKERS),
+                )
+    return _catalog
+
+
+def setup():
+    """Start listing the config.ini account's finetunes once a key is set, so the finetune dropdowns fill early."""
+    get_finetune_catalog().cached_ids()
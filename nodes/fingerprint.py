@@ -0,0 +1,50 @@
+import hashlib
+import time
+
+from .config_node import get_config_loader
+
+# Seconds a management node's output is reused by ComfyUI's executor cache. Flux Credits follows the TTL of
+# the credits cache instead.
+STATUS_TTL = 15
+INVENTORY_TTL = 300
+
+
+def config_fingerprint(config_override=None):
+    """
+    Short hash of the API key, base URL and region a node would use.
+
+    It covers config.ini as well as a connected Flux Config (BFL) node, so editing config.ini invalidates
+    cached outputs. The key itself is never returned.
+    """
+    try:
+        config_loader_instance = get_config_loader(config_override)
+        material = "\n".join(
+            [
+                config_loader_instance.get_x_key(),
+                config_loader_instance.get_key("API", "BASE_URL"),
+                (config_override or {}).get("default_region") or "",
+            ]
+        )
+    except KeyError:
+        material = ""
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()[:16]
+
+
+def generation_fingerprint(seed=-1, config=None):
+    """
+    IS_CHANGED value of a generation node.
+
+    seed -1 asks the API for a random seed, so the node must run every time: NaN never equals the previous
+    value. With a fixed seed the request is deterministic and ComfyUI's own input comparison decides, plus
+    the config fingerprint.
+    """
+    if seed is None or seed == -1:
+        return float("nan")
+    return config_fingerprint(config)
+
+
+def ttl_fingerprint(ttl, config=None):
+    """IS_CHANGED value that lets ComfyUI reuse a node's output for up to `ttl` seconds per config (never for 0)."""
+    if ttl <= 0:
+        return float("nan")
+    return f"{config_fingerprint(config)}:{int(time.time() // ttl)}"
@@ -3,6 +3,11 @@ from .base import BaseFlux
 
 class FluxErase(BaseFlux):
     CATEGORY = "BFL"
+    TENSOR_INPUTS = {
+        "image_tensor": ("IMAGE", "image"),
+        "mask_tensor": ("MASK", "mask"),
+    }
+    IMAGE_URLS = True
 
     @classmethod
     def INPUT_TYPES(cls):
@@ -101,6 +106,10 @@ class FluxErase(BaseFlux):
 
 class FluxOutpaint(BaseFlux):
     CATEGORY = "BFL"
+    TENSOR_INPUTS = {
+        "input_image_tensor": ("IMAGE", "input_image"),
+    }
+    IMAGE_URLS = True
 
     @classmethod
     def INPUT_TYPES(cls):
@@ -212,6 +221,10 @@ class FluxOutpaint(BaseFlux):
             },
         }
 
+    def accepts_image_urls(self, arguments):
+        # mode "fast" requires base64 images
+        return arguments.get("mode", "high") != "fast"
+
     def generate_image(
         self,
         input_image,
@@ -246,6 +259,11 @@ class FluxOutpaint(BaseFlux):
 
 class FluxVirtualTryOn(BaseFlux):
     CATEGORY = "BFL"
+    TENSOR_INPUTS = {
+        "person_tensor": ("IMAGE", "person"),
+        "garment_tensor": ("IMAGE", "garment"),
+    }
+    IMAGE_URLS = True
 
     @classmethod
     def INPUT_TYPES(cls):
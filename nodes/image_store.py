@@ -0,0 +1,268 @@
+import abc
+import base64
+import hashlib
+import os
+import re
+import threading
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urljoin
+
+from .config import get_config_loader
+from .server_routes import DEFAULT_STANDALONE_HOST, register_route
+
+INPUTS_ROUTE = "/bfl/inputs"
+DEFAULT_URL_EXPIRY = 3600  # seconds presigned S3 URLs stay valid
+_NAME_PATTERN = re.compile(r"^[0-9a-f]{64}\.(png|jpg|webp)$")
+
+_FORMATS = {
+    "png": ("png", "image/png"),
+    "jpeg": ("jpg", "image/jpeg"),
+    "webp": ("webp", "image/webp"),
+}
+
+
+def is_url(value):
+    return isinstance(value, str) and value.startswith(("http://", "https://"))
+
+
+def sniff_format(data):
+    """Image format of encoded bytes from their magic number: "png", "jpeg", "webp", or None."""
+    if data.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "png"
+    if data.startswith(b"\xff\xd8\xff"):
+        return "jpeg"
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "webp"
+    return None
+
+
+def decode_base64_image(value):
+    """Bytes of a base64 image string (bare or a data: URL)."""
+    if value.startswith("data:"):
+        value = value.split(",", 1)[1]
+    return base64.b64decode(value)
+
+
+class ImageStore(abc.ABC):
+    """
+    Hosts input images so requests can reference them by URL instead of inlining base64.
+
+    Objects are content-addressed (sha256 of the bytes), so an image that was stored before is not
+    uploaded again. Subclasses implement exists(), upload() and url().
+    """
+
+    def __init__(self):
+        self._known = set()
+        self._lock = threading.Lock()
+
+    def put(self, data):
+        """Store encoded image bytes and return the URL the API can fetch them from."""
+        image_format = sniff_format(data)
+        if image_format is None:
+            raise ValueError("Not a PNG, JPEG or WebP image")
+        extension, content_type = _FORMATS[image_format]
+        name = f"{hashlib.sha256(data).hexdigest()}.{extension}"
+        with self._lock:
+            known = name in self._known
+        if not known and not self.exists(name):
+            self.upload(name, data, content_type)
+            print(f"[BFL] Stored input image {name} ({len(data) / 1024:.0f} KiB)")
+        with self._lock:
+            self._known.add(name)
+        return self.url(name)
+
+    def put_base64(self, value):
+        """Store a base64 image string; URLs are passed through unchanged."""
+        if is_url(value):
+            return value
+        return self.put(decode_base64_image(value))
+
+    @abc.abstractmethod
+    def exists(self, name):
+        """True when an object called `name` is already stored."""
+
+    @abc.abstractmethod
+    def upload(self, name, data, content_type):
+        """Store `data` under `name`."""
+
+    @abc.abstractmethod
+    def url(self, name):
+        """URL the API can fetch the object `name` from."""
+
+
+class LocalDirStore(ImageStore):
+    """Keeps inputs in a local directory, served at /bfl/inputs/<name> on the ComfyUI server or a standalone port."""
+
+    def __init__(self, directory, public_url):
+        super().__init__()
+        self.directory = directory
+        self.public_url = public_url if public_url.endswith("/") else f"{public_url}/"
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, name):
+        if not _NAME_PATTERN.match(name):
+            raise ValueError(f"Invalid input image name '{name}'")
+        return os.path.join(self.directory, name)
+
+    def exists(self, name):
+        return os.path.exists(self.path(name))
+
+    def upload(self, name, data, content_type):
+        tmp_path = f"{self.path(name)}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, self.path(name))
+
+    def url(self, name):
+        return urljoin(self.public_url, name)
+
+
+class S3Store(ImageStore):
+    """
+    Uploads inputs to an S3-compatible bucket (AWS, MinIO, R2, ...) with the optional boto3 package.
+
+    URLs point at `public_url` when the bucket is publicly readable, otherwise they are presigned GET URLs
+    valid for `url_expiry` seconds.
+    """
+
+    def __init__(
+        self,
+        bucket,
+        prefix="",
+        endpoint_url="",
+        region="",
+        access_key="",
+        secret_key="",
+        public_url="",
+        url_expiry=DEFAULT_URL_EXPIRY,
+    ):
+        try:
+            import boto3
+            from botocore.exceptions import ClientError
+        except ImportError as e:
+            raise ImportError("The s3 image store needs boto3: pip install boto3") from e
+        super().__init__()
+        self.bucket = bucket
+        self.prefix = prefix.strip("/") + "/" if prefix.strip("/") else ""
+        self.public_url = public_url if not public_url or public_url.endswith("/") else f"{public_url}/"
+        self.url_expiry = url_expiry
+        self._client_error = ClientError
+        self._client = boto3.client(
+            "s3",
+            endpoint_url=endpoint_url or None,
+            region_name=region or None,
+            aws_access_key_id=access_key or None,
+            aws_secret_access_key=secret_key or None,
+        )
+
+    def exists(self, name):
+        try:
+            self._client.head_object(Bucket=self.bucket, Key=self.prefix + name)
+            return True
+        except self._client_error:
+            return False
+
+    def upload(self, name, data, content_type):
+        self._client.put_object(Bucket=self.bucket, Key=self.prefix + name, Body=data, ContentType=content_type)
+
+    def url(self, name):
+        if self.public_url:
+            return urljoin(self.public_url, self.prefix + name)
+        return self._client.generate_presigned_url(
+            "get_object", Params={"Bucket": self.bucket, "Key": self.prefix + name}, ExpiresIn=self.url_expiry
+        )
+
+
+def start_standalone(directory, host, port):
+    """Serve a LocalDirStore directory from a small HTTP listener of its own, under /bfl/inputs/."""
+
+    class _Handler(SimpleHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def translate_path(self, path):
+            name = path.split("?")[0].rsplit("/", 1)[-1]
+            if not path.startswith(f"{INPUTS_ROUTE}/") or not _NAME_PATTERN.match(name):
+                return os.path.join(directory, "missing")
+            return os.path.join(directory, name)
+
+        def list_directory(self, path):
+            self.send_error(404)
+
+    server = ThreadingHTTPServer((host, port), partial(_Handler, directory=directory))
+    threading.Thread(target=server.serve_forever, name="bfl-inputs", daemon=True).start()
+    print(f"[BFL] Input images served on http://{host}:{server.server_address[1]}{INPUTS_ROUTE}/")
+    return server
+
+
+def register_server_routes(store):
+    """Serve a LocalDirStore from the running ComfyUI server, if there is one."""
+
+    async def bfl_input_image(request):
+        from aiohttp import web
+
+        try:
+            path = store.path(request.match_info["name"])
+        except ValueError:
+            raise web.HTTPNotFound() from None
+        if not os.path.exists(path):
+            raise web.HTTPNotFound()
+        return web.FileResponse(path)
+
+    return register_route("GET", INPUTS_ROUTE + "/{name}", bfl_input_image)
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def _create_store(config):
+    backend = config.get_str("IMAGE_STORE", "BACKEND", "none").lower()
+    if backend == "local":
+        directory = os.path.expanduser(config.get_str("IMAGE_STORE", "LOCAL_DIR"))
+        public_url = config.get_str("IMAGE_STORE", "PUBLIC_URL")
+        if not directory or not public_url:
+            print("[BFL] Image store 'local' needs LOCAL_DIR and PUBLIC_URL, sending inputs inline")
+            return None
+        return LocalDirStore(directory, public_url)
+    if backend == "s3":
+        return S3Store(
+            config.get_str("IMAGE_STORE", "BUCKET"),
+            prefix=config.get_str("IMAGE_STORE", "PREFIX"),
+            endpoint_url=config.get_str("IMAGE_STORE", "ENDPOINT_URL"),
+            region=config.get_str("IMAGE_STORE", "REGION"),
+            access_key=config.get_str("IMAGE_STORE", "ACCESS_KEY"),
+            secret_key=config.get_str("IMAGE_STORE", "SECRET_KEY"),
+            public_url=config.get_str("IMAGE_STORE", "PUBLIC_URL"),
+            url_expiry=config.get_int("IMAGE_STORE", "URL_EXPIRY", DEFAULT_URL_EXPIRY),
+        )
+    return None
+
+
+def get_image_store():
+    """Return the process-wide ImageStore configured from [IMAGE_STORE] in config.ini, or None (inline base64)."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                try:
+                    _store = _create_store(get_config_loader()) or False
+                except Exception as e:
+                    print(f"[BFL] Image store unavailable, sending inputs inline: {str(e)}")
+                    _store = False
+    return _store or None
+
+
+def setup():
+    """Serve a local image store from the ComfyUI server and/or a standalone port."""
+    store = get_image_store()
+    if not isinstance(store, LocalDirStore):
+        return
+    if register_server_routes(store):
+        print(f"[BFL] Input images served at {INPUTS_ROUTE}/")
+    config = get_config_loader()
+    port = config.get_int("IMAGE_STORE", "STANDALONE_PORT", 0)
+    if port:
+        host = config.get_str("IMAGE_STORE", "STANDALONE_HOST", DEFAULT_STANDALONE_HOST)
+        start_standalone(store.directory, host, port)
@@ -0,0 +1,193 @@
+import base64
+import io
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import torch
+from PIL import Image
+
+from .config import get_config_loader
+from .encode_cache import get_encode_cache
+
+JPEG_QUALITY = 95
+MAX_ENCODE_WORKERS = 8
+OUTPUT_DTYPES = {"float32": torch.float32, "float16": torch.float16}
+
+
+def resolve_output_dtype(name="default"):
+    """torch dtype for an output_dtype input; "default" uses DTYPE from the [OUTPUT] section of config.ini."""
+    if name == "default":
+        name = get_config_loader().get_str("OUTPUT", "DTYPE", "float32").lower()
+    if name not in OUTPUT_DTYPES:
+        print(f"Warning: unknown output dtype '{name}', using float32.")
+        return torch.float32
+    return OUTPUT_DTYPES[name]
+
+
+def pil_to_tensor(img, dtype=torch.float32):
+    """Convert a PIL image to an (H, W, 3) tensor in [0, 1], scaled from uint8 straight into `dtype`."""
+    if img.mode != "RGB":
+        img = img.convert("RGB")
+    return torch.from_numpy(np.array(img, dtype=np.uint8)).to(dtype).div_(255.0)
+
+
+def tensor_nbytes(tensor):
+    return tensor.element_size() * tensor.nelement()
+
+
+def tensor_to_uint8(images):
+    """Scale ComfyUI IMAGE data (float in [0, 1]) to a uint8 numpy array in one pass, for a single image or a batch."""
+    return images.detach().mul(255).clamp_(0, 255).to(torch.uint8).cpu().numpy()
+
+
+def uint8_to_pil(img_array):
+    """Wrap an (H, W, C) uint8 array as a PIL image: L for one channel, RGB for three, RGBA for four."""
+    if img_array.shape[-1] == 1:
+        img_array = img_array[..., 0]
+    return Image.fromarray(img_array)
+
+
+def tensor_to_pil(image):
+    """Convert one ComfyUI IMAGE (H, W, C float in [0, 1]) to a PIL image."""
+    return uint8_to_pil(tensor_to_uint8(image))
+
+
+def mask_to_pil(mask):
+    """Convert one ComfyUI MASK (H, W float, 1 = masked) to a black/white "L" image, white where masked."""
+    return Image.fromarray(tensor_to_uint8(mask))
+
+
+def encode_pil(pil_image, image_format="jpeg", **save_options):
+    """Encode a PIL image to a base64 string in `image_format` ("jpeg", "png" or "webp")."""
+    image_format = image_format.lower()
+    if image_format == "jpeg" and pil_image.mode not in ("RGB", "L"):
+        pil_image = pil_image.convert("RGB")
+    buffer = io.BytesIO()
+    pil_image.save(buffer, format=image_format.upper(), **save_options)
+    return base64.b64encode(buffer.getvalue()).decode("utf-8")
+
+
+def cached_encode(tensor, params, encode):
+    """Look an encoding of `tensor` with `params` up in the shared encode cache, running `encode()` on a miss."""
+    cache = get_encode_cache()
+    if cache is None:
+        return encode()
+    return cache.get_or_encode(tensor, params, encode)
+
+
+def save_options(image_format, quality=None, compress_level=None):
+    """PIL save options for the quality controls of `image_format`."""
+    image_format = image_format.lower()
+    if image_format in ("jpeg", "webp") and quality is not None:
+        return {"quality": quality}
+    if image_format == "png" and compress_level is not None:
+        return {"compress_level": compress_level}
+    return {}
+
+
+def map_parallel(fn, items):
+    """Apply `fn` to every item in worker threads (PIL and torch release the GIL), keeping the order."""
+    if len(items) == 1:
+        return [fn(items[0])]
+    workers = min(len(items), os.cpu_count() or 1, MAX_ENCODE_WORKERS)
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bfl-encode") as executor:
+        return list(executor.map(fn, items))
+
+
+def encode_batch(images, image_format="jpeg", **options):
+    """
+    Encode every image of an IMAGE batch (N, H, W, C) to base64, in parallel worker threads.
+
+    Each worker scales and compresses its own image, so no float copy of the whole batch is made. PIL and
+    torch release the GIL while working, so the images of a batch are encoded concurrently.
+    """
+
+    def encode(image):
+        return cached_encode(
+            image, ("IMAGE", image_format, options), lambda: encode_pil(tensor_to_pil(image), image_format, **options)
+        )
+
+    return map_parallel(encode, images)
+
+
+def refine_mask(mask, threshold=0.5, dilate_pixels=0, feather_pixels=0):
+    """
+    Threshold a MASK (H, W) or MASK batch (N, H, W), then grow and soften it, with whole-tensor ops.
+
+    Values above `threshold` become 1. Dilation is a max-pool with a (2 * dilate_pixels + 1) square window;
+    feathering is a separable Gaussian blur with radius `feather_pixels`. Returns floats in [0, 1].
+    """
+    single = mask.dim() == 2
+    x = (mask.detach()[None,] if single else mask.detach()).gt(threshold).float()[:, None]
+    if dilate_pixels > 0:
+        x = torch.nn.functional.max_pool2d(x, 2 * dilate_pixels + 1, stride=1, padding=dilate_pixels)
+    if feather_pixels > 0:
+        offsets = torch.arange(-feather_pixels, feather_pixels + 1, dtype=torch.float32, device=x.device)
+        kernel = torch.exp(-(offsets**2) / (2 * (feather_pixels / 2) ** 2))
+        kernel /= kernel.sum()
+        pad = feather_pixels
+        x = torch.nn.functional.pad(x, (pad, pad, 0, 0), mode="replicate")
+        x = torch.nn.functional.conv2d(x, kernel.view(1, 1, 1, -1))
+        x = torch.nn.functional.pad(x, (0, 0, pad, pad), mode="replicate")
+        x = torch.nn.functional.conv2d(x, kernel.view(1, 1, -1, 1))
+    x = x[:, 0]
+    return x[0] if single else x
+
+
+def mask_to_png(mask, bit_depth=1, compress_level=None):
+    """
+    Encode one refined MASK (H, W) as a grayscale PNG, white where masked.
+
+    bit_depth 1 packs the mask into a 1-bit PNG (values >= 0.5 are white); 8 keeps soft edges.
+    """
+    options = save_options("png", compress_level=compress_level)
+    if bit_depth == 1:
+        height, width = mask.shape
+        bits = np.packbits(mask.ge(0.5).cpu().numpy(), axis=-1)
+        return encode_pil(Image.frombytes("1", (width, height), bits.tobytes()), "png", **options)
+    return encode_pil(Image.fromarray(tensor_to_uint8(mask)), "png", **options)
+
+
+def encode_mask_batch(masks, threshold=0.5, dilate_pixels=0, feather_pixels=0, bit_depth=1, compress_level=None):
+    """Refine and encode every mask of a MASK batch (N, H, W) or single mask to base64 PNG, in parallel."""
+    if masks.dim() == 2:
+        masks = masks[None,]
+    params = ("MASK", threshold, dilate_pixels, feather_pixels, bit_depth, compress_level)
+
+    def encode(mask):
+        return cached_encode(
+            mask,
+            params,
+            lambda: mask_to_png(refine_mask(mask, threshold, dilate_pixels, feather_pixels), bit_depth, compress_level),
+        )
+
+    return map_parallel(encode, masks)
+
+
+def encode_tensor_input(kind, tensor, budget=None, label=None):
+    """
+    Encode an IMAGE or MASK socket value for a request field.
+
+    Only the first item of a batch is used. Images are sent as JPEG (quality 95), masks as lossless PNG so
+    their edges stay exact. With an InputBudget, the image is downscaled and re-encoded to fit it.
+    """
+    if kind == "MASK":
+        item = tensor[0] if tensor.dim() == 3 else tensor
+        to_pil, image_format, options = mask_to_pil, "png", {}
+    else:
+        item = tensor[0] if tensor.dim() == 4 else tensor
+        to_pil, image_format, options = tensor_to_pil, "jpeg", {"quality": JPEG_QUALITY}
+    if budget is None:
+        return cached_encode(
+            item, (kind, image_format, options), lambda: encode_pil(to_pil(item), image_format, **options)
+        )
+
+    # Imported here, the budget helpers build on this module
+    from .budget import fit_pil
+
+    return cached_encode(
+        item,
+        (kind, "budget", budget.params()),
+        lambda: fit_pil(to_pil(item), budget, label or kind, mask=kind == "MASK"),
+    )
@@ -0,0 +1,171 @@
+import heapq
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from .config import get_config_loader
+from .retry import CircuitOpenError
+
+DEFAULT_MAX_POLLS_PER_SECOND = 20  # across all outstanding tasks
+DEFAULT_POLL_WORKERS = 8  # concurrent get_result requests
+
+
+class _PendingTask:
+    __slots__ = ("task_id", "poll", "policy", "max_attempts", "start_time", "next_poll", "attempt", "future")
+
+    def __init__(self, task_id, poll, policy, max_attempts):
+        self.task_id = task_id
+        self.poll = poll
+        self.policy = policy
+        self.max_attempts = max_attempts
+        self.start_time = time.monotonic()
+        self.next_poll = self.start_time + policy.next_delay(1, 0.0)
+        self.attempt = 1
+        self.future = Future()
+
+
+class TaskPoller:
+    """
+    One background scheduler polling every outstanding BFL task.
+
+    Tasks are kept in a table keyed by task id plus a heap ordered by next-poll time. The scheduler thread
+    dispatches due polls to a small worker pool (over the shared HTTP session), never faster than
+    max_polls_per_second overall, and reschedules pending tasks according to their PollingPolicy.
+    While the get_result circuit is open, polls are postponed until it lets requests through again, within
+    the policy's timeout.
+    Each task resolves a Future with (status, result): Status.READY and the result when the image can be
+    downloaded, a terminal Status when the task failed, or (None, None) when the time or attempt budget ran out.
+    """
+
+    def __init__(self, max_polls_per_second=DEFAULT_MAX_POLLS_PER_SECOND, workers=DEFAULT_POLL_WORKERS):
+        self._interval = 1.0 / max_polls_per_second if max_polls_per_second > 0 else 0.0
+        self._tasks = {}
+        self._queue = []
+        self._cond = threading.Condition()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bfl-poll")
+        self._thread = None
+        self._last_dispatch = 0.0
+
+    def track(self, task_id, poll, policy, max_attempts=None):
+        """
+        Start polling a task.
+
+        Args:
+            task_id: BFL task id.
+            poll: Callable (attempt, elapsed) -> (status, result) making a single get_result request.
+            policy: PollingPolicy for the task's endpoint.
+            max_attempts: Optional cap on the number of polls on top of the policy's timeout.
+
+        Returns:
+            Future resolving to (status, result).
+        """
+        with self._cond:
+            if task_id in self._tasks:
+                return self._tasks[task_id].future
+            task = _PendingTask(task_id, poll, policy, max_attempts)
+            self._tasks[task_id] = task
+            heapq.heappush(self._queue, (task.next_poll, task_id))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="bfl-poller", daemon=True)
+                self._thread.start()
+            self._cond.notify()
+            in_flight = len(self._tasks)
+        print(f"[BFL] Polling task {task_id} (timeout {policy.timeout:.0f}s, {in_flight} in flight)")
+        return task.future
+
+    def complete(self, task_id, status, result):
+        """Resolve a task without waiting for its next poll, e.g. when its result was pushed to us."""
+        with self._cond:
+            task = self._tasks.pop(task_id, None)
+        if task is not None and not task.future.done():
+            task.future.set_result((status, result))
+        return task is not None
+
+    def in_flight(self):
+        with self._cond:
+            return len(self._tasks)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while True:
+                    if not self._queue:
+                        self._cond.wait()
+                        continue
+                    due, task_id = self._queue[0]
+                    wait = max(due, self._last_dispatch + self._interval) - time.monotonic()
+                    if wait <= 0:
+                        break
+                    self._cond.wait(wait)
+                heapq.heappop(self._queue)
+                task = self._tasks.get(task_id)
+                # Skip entries left behind by completed, cancelled or rescheduled tasks
+                if task is None or task.next_poll != due:
+                    continue
+                if task.future.cancelled():
+                    del self._tasks[task_id]
+                    continue
+                self._last_dispatch = time.monotonic()
+            self._executor.submit(self._poll, task)
+
+    def _poll(self, task):
+        try:
+            status, result = task.poll(task.attempt, time.monotonic() - task.start_time)
+        except CircuitOpenError as e:
+            # The task is still running upstream: poll again once the circuit lets requests through
+            remaining = task.policy.timeout - (time.monotonic() - task.start_time)
+            if remaining <= 0:
+                print(f"[BFL] Gave up on task {task.task_id}: {str(e)}")
+                self.complete(task.task_id, None, None)
+                return
+            delay = min(e.retry_after, remaining)
+            print(f"[BFL] {str(e)}, polling task {task.task_id} again in {delay:.1f}s")
+            self._reschedule(task, delay)
+            return
+        except Exception as e:
+            print(f"[BFL] Unexpected error polling task {task.task_id}: {str(e)}")
+            status, result = None, None
+
+        if status is not None:
+            self.complete(task.task_id, status, result)
+            return
+
+        elapsed = time.monotonic() - task.start_time
+        if (task.max_attempts is not None and task.attempt >= task.max_attempts) or elapsed >= task.policy.timeout:
+            print(f"[BFL] Gave up on task {task.task_id} after {task.attempt} polls and {elapsed:.1f}s")
+            self.complete(task.task_id, None, None)
+            return
+
+        task.attempt += 1
+        progress = result.get("progress") if result else None
+        delay = min(task.policy.next_delay(task.attempt, elapsed, progress), task.policy.timeout - elapsed)
+        print(f"[BFL] Next poll of task {task.task_id} in {delay:.1f}s")
+        self._reschedule(task, delay)
+
+    def _reschedule(self, task, delay):
+        with self._cond:
+            if task.task_id not in self._tasks:
+                return
+            task.next_poll = time.monotonic() + delay
+            heapq.heappush(self._queue, (task.next_poll, task.task_id))
+            self._cond.notify()
+
+
+_poller = None
+_poller_lock = threading.Lock()
+
+
+def get_poller():
+    """Return the process-wide TaskPoller, configured from the [POLLING] section of config.ini."""
+    global _poller
+    if _poller is None:
+        with _poller_lock:
+            if _poller is None:
+                config = get_config_loader()
+                _poller = TaskPoller(
+                    max_polls_per_second=config.get_int(
+                        "POLLING", "MAX_POLLS_PER_SECOND", DEFAULT_MAX_POLLS_PER_SECOND
+                    ),
+                    workers=config.get_int("POLLING", "WORKERS", DEFAULT_POLL_WORKERS),
+                )
+    return _poller
@@ -0,0 +1,90 @@
+import random
+
+
+class PollingPolicy:
+    """
+    Schedule for get_result polls.
+
+    The first poll comes after a short delay, later polls back off exponentially with jitter up to a cap.
+    When the API reports a `progress` value, the next poll is aimed at the estimated completion time instead,
+    still clamped to [min_delay, max_delay].
+
+    Args:
+        first_delay: Seconds between submitting the task and the first poll.
+        factor: Growth of the delay between consecutive polls.
+        max_delay: Upper bound for any delay.
+        min_delay: Lower bound for progress-based delays.
+        jitter: Relative random spread applied to every delay (0.2 = ±20%), so concurrent tasks don't poll in lockstep.
+        timeout: Seconds after which the task is given up on.
+    """
+
+    def __init__(self, first_delay=1.0, factor=1.5, max_delay=8.0, min_delay=0.5, jitter=0.2, timeout=200.0):
+        self.first_delay = first_delay
+        self.factor = factor
+        self.max_delay = max_delay
+        self.min_delay = min_delay
+        self.jitter = jitter
+        self.timeout = timeout
+
+    def next_delay(self, attempt, elapsed, progress=None):
+        """
+        Seconds to wait before poll number `attempt` (1-based).
+
+        Args:
+            attempt: Number of the poll about to be made.
+            elapsed: Seconds since the task was submitted.
+            progress: Last reported progress, as a 0-1 fraction or a 0-100 percentage, if any.
+        """
+        if attempt <= 1:
+            delay = self.first_delay
+        else:
+            delay = min(self.first_delay * self.factor ** (attempt - 1), self.max_delay)
+
+        fraction = _progress_fraction(progress)
+        if fraction is not None and elapsed > 0:
+            remaining = elapsed * (1.0 - fraction) / fraction
+            delay = min(max(remaining, self.min_delay), self.max_delay)
+
+        if self.jitter:
+            delay *= random.uniform(1.0 - self.jitter, 1.0 + self.jitter)
+        return max(delay, 0.0)
+
+
+def _progress_fraction(progress):
+    try:
+        value = float(progress)
+    except (TypeError, ValueError):
+        return None
+    if value > 1.0:
+        value /= 100.0
+    if 0.0 < value < 1.0:
+        return value
+    return None
+
+
+DEFAULT_POLICY = PollingPolicy()
+
+# Per-endpoint defaults, matched by longest endpoint prefix. Klein models are usually ready within
+# a couple of seconds, Ultra and Kontext Max jobs take much longer and don't need frequent polls.
+ENDPOINT_POLICIES = {
+    "flux-2-klein": PollingPolicy(first_delay=0.75, factor=1.4, max_delay=3.0),
+    "flux-2": PollingPolicy(first_delay=1.5, factor=1.5, max_delay=6.0),
+    "flux-dev": PollingPolicy(first_delay=1.5, factor=1.5, max_delay=6.0),
+    "flux-pro-1.1-ultra": PollingPolicy(first_delay=4.0, factor=1.5, max_delay=10.0, timeout=300.0),
+    "flux-kontext": PollingPolicy(first_delay=2.0, factor=1.5, max_delay=8.0),
+    "flux-tools": PollingPolicy(first_delay=2.0, factor=1.5, max_delay=8.0),
+}
+
+
+def register_polling_policy(endpoint_prefix, policy):
+    """Set the polling policy for every endpoint starting with `endpoint_prefix`."""
+    ENDPOINT_POLICIES[endpoint_prefix] = policy
+
+
+def get_polling_policy(url_path):
+    """Return the polling policy for an endpoint path such as "flux-2-klein-4b"."""
+    if url_path:
+        matches = [prefix for prefix in ENDPOINT_POLICIES if url_path.startswith(prefix)]
+        if matches:
+            return ENDPOINT_POLICIES[max(matches, key=len)]
+    return DEFAULT_POLICY
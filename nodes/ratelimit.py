@@ -0,0 +1,128 @@
+import asyncio
+import hashlib
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+from .config import get_config_loader
+
+DEFAULT_SUBMITS_PER_SECOND = 2.0
+DEFAULT_BURST = 4
+DEFAULT_INITIAL_CONCURRENCY = 6
+DEFAULT_MAX_CONCURRENCY = 24  # BFL's default active-task limit per key
+DEFAULT_BACKOFF = 5.0  # seconds to pause an endpoint after a 429 without Retry-After
+MAX_RATE_LIMIT_RETRIES = 5
+MAX_WAIT_STEP = 0.25  # seconds between admission checks while waiting
+
+
+class RateLimitedError(Exception):
+    """Raised by BaseFlux.post_request when the API answers 429."""
+
+    def __init__(self, retry_after=None):
+        super().__init__(f"Rate limited by the API (retry after {retry_after}s)")
+        self.retry_after = retry_after
+
+
+def parse_retry_after(value):
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP date), or None."""
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+class AdmissionController:
+    """
+    Client-side admission control for one API key and endpoint.
+
+    Every submit takes a token from a token bucket (rate / burst) and an in-flight slot. The slot is held
+    until the task has finished, so the number of active tasks stays within `limit`. The limit adapts with
+    AIMD: it grows by about one per round of successful tasks and halves on every 429. A 429 also pauses
+    new submits for the Retry-After period.
+    """
+
+    def __init__(
+        self,
+        name,
+        rate=DEFAULT_SUBMITS_PER_SECOND,
+        burst=DEFAULT_BURST,
+        initial_concurrency=DEFAULT_INITIAL_CONCURRENCY,
+        max_concurrency=DEFAULT_MAX_CONCURRENCY,
+    ):
+        self.name = name
+        self.rate = rate
+        self.burst = burst
+        self.max_concurrency = max_concurrency
+        self.limit = float(min(initial_concurrency, max_concurrency))
+        self.in_flight = 0
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def try_acquire(self):
+        """Take a token and a slot. Returns 0 on success, otherwise the number of seconds to wait."""
+        with self._lock:
+            now = time.monotonic()
+            if self.rate > 0:
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if now < self._blocked_until:
+                return self._blocked_until - now
+            if self.in_flight >= int(self.limit):
+                return MAX_WAIT_STEP
+            if self.rate > 0 and self._tokens < 1.0:
+                return (1.0 - self._tokens) / self.rate
+            self._tokens -= 1.0
+            self.in_flight += 1
+            return 0.0
+
+    async def acquire_async(self):
+        while (wait := self.try_acquire()) > 0:
+            await asyncio.sleep(min(wait, MAX_WAIT_STEP))
+
+    def release(self, rate_limited=False, retry_after=None, success=True):
+        """
+        Return a slot.
+
+        `rate_limited` marks a submit rejected with 429, which shrinks the limit. `success=False` marks a task
+        that failed for another reason (rejected submit, error, cancellation): the slot is freed and the
+        limit is left unchanged. Only successful tasks grow it.
+        """
+        with self._lock:
+            self.in_flight = max(self.in_flight - 1, 0)
+            if rate_limited:
+                self.limit = max(self.limit / 2.0, 1.0)
+                pause = retry_after if retry_after is not None else DEFAULT_BACKOFF
+                self._blocked_until = max(self._blocked_until, time.monotonic() + pause)
+                print(f"[BFL] 429 on {self.name}: pausing {pause:.1f}s, concurrency limit now {int(self.limit)}")
+            elif success:
+                self.limit = min(self.limit + 1.0 / self.limit, float(self.max_concurrency))
+
+
+_controllers = {}
+_controllers_lock = threading.Lock()
+
+
+def get_admission_controller(x_key, url_path):
+    """Return the shared AdmissionController for an API key and endpoint, configured from [RATE_LIMIT]."""
+    key_id = hashlib.sha256((x_key or "").encode("utf-8")).hexdigest()[:12]
+    with _controllers_lock:
+        controller = _controllers.get((key_id, url_path))
+        if controller is None:
+            config = get_config_loader()
+            controller = AdmissionController(
+                f"{url_path} (key {key_id[:6]})",
+                rate=config.get_float("RATE_LIMIT", "SUBMITS_PER_SECOND", DEFAULT_SUBMITS_PER_SECOND),
+                burst=config.get_int("RATE_LIMIT", "BURST", DEFAULT_BURST),
+                initial_concurrency=config.get_int("RATE_LIMIT", "INITIAL_CONCURRENCY", DEFAULT_INITIAL_CONCURRENCY),
+                max_concurrency=config.get_int("RATE_LIMIT", "MAX_CONCURRENCY", DEFAULT_MAX_CONCURRENCY),
+            )
+            _controllers[(key_id, url_path)] = controller
+        return controller
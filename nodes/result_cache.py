@@ -0,0 +1,172 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+from .config import get_config_loader
+from .export import DeliveredImage
+from .server_routes import json_response, register_route
+
+DEFAULT_MAX_MB = 2048
+DEFAULT_MAX_AGE_DAYS = 30
+DEFAULT_DIR = os.path.join("~", ".cache", "comfyui-bfl-api", "results")
+INLINE_LIMIT = 1024  # longer string arguments (base64 images) are keyed by their hash
+STATS_ROUTE = "/bfl/result_cache"
+# Arguments that change where the result is delivered, not what it is
+_IGNORED_ARGUMENTS = ("webhook_url", "webhook_secret")
+
+
+def request_key(url_path, arguments):
+    """
+    Hash of an endpoint and its arguments, or None when the request is not reproducible (no seed).
+
+    Arguments are canonicalized as sorted JSON; strings longer than INLINE_LIMIT are replaced by their
+    sha256, so multi-megabyte base64 inputs are never kept in the key material.
+    """
+    if arguments.get("seed") is None:
+        return None
+    canonical = {}
+    for name, value in arguments.items():
+        if name in _IGNORED_ARGUMENTS:
+            continue
+        if isinstance(value, str) and len(value) > INLINE_LIMIT:
+            value = "sha256:" + hashlib.sha256(value.encode("utf-8")).hexdigest()
+        canonical[name] = value
+    material = json.dumps([url_path, canonical], sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    """
+    On-disk cache of delivered result images, keyed by request_key().
+
+    Each entry is the delivered bytes (`<key>.img`) plus its metadata (`<key>.json`). Entries not used for
+    `max_age` seconds are dropped, and the least recently used ones are evicted above `max_bytes`.
+    """
+
+    def __init__(self, directory, max_bytes=DEFAULT_MAX_MB * 1024 * 1024, max_age=DEFAULT_MAX_AGE_DAYS * 86400):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _paths(self, key):
+        base = os.path.join(self.directory, key)
+        return f"{base}.img", f"{base}.json"
+
+    def get(self, key):
+        """Return the cached DeliveredImage for `key`, or None."""
+        delivered = self._read(key)
+        with self._lock:
+            if delivered is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return delivered
+
+    def _read(self, key):
+        image_path, meta_path = self._paths(key)
+        try:
+            if time.time() - os.path.getmtime(image_path) > self.max_age:
+                self._remove(key)
+                return None
+            with open(meta_path, encoding="utf-8") as f:
+                metadata = json.load(f)
+            with open(image_path, "rb") as f:
+                data = f.read()
+            os.utime(image_path)  # mark as recently used for eviction
+        except (OSError, ValueError):
+            return None
+        return DeliveredImage(data, metadata)
+
+    def put(self, key, delivered):
+        if len(delivered.data) > self.max_bytes:
+            return
+        image_path, meta_path = self._paths(key)
+        suffix = f".{threading.get_ident()}.tmp"
+        try:
+            with open(meta_path + suffix, "w", encoding="utf-8") as f:
+                json.dump(delivered.metadata, f)
+            with open(image_path + suffix, "wb") as f:
+                f.write(delivered.data)
+            # Metadata first: an .img file is only visible once its metadata is in place
+            os.replace(meta_path + suffix, meta_path)
+            os.replace(image_path + suffix, image_path)
+            self._evict()
+        except OSError as e:
+            print(f"[BFL] Could not write result cache entry: {str(e)}")
+
+    def _remove(self, key):
+        for path in self._paths(key):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def _evict(self):
+        now = time.time()
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".img"):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.name[:-4]))
+        total = sum(size for _, size, _ in entries)
+        for mtime, size, key in sorted(entries):
+            if total <= self.max_bytes and now - mtime <= self.max_age:
+                break
+            self._remove(key)
+            total -= size
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "directory": self.directory,
+            }
+
+
+def register_server_routes():
+    """Serve the cache counters at GET /bfl/result_cache on the running ComfyUI server, if there is one."""
+
+    async def bfl_result_cache(request):
+        cache = get_result_cache()
+        return json_response(cache.stats() if cache is not None else {"enabled": False})
+
+    return register_route("GET", STATS_ROUTE, bfl_result_cache)
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_result_cache():
+    """Return the process-wide ResultCache configured from [RESULT_CACHE] in config.ini, or None when disabled."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                config = get_config_loader()
+                if not config.get_bool("RESULT_CACHE", "ENABLED", False):
+                    _cache = False
+                else:
+                    try:
+                        _cache = ResultCache(
+                            os.path.expanduser(config.get_str("RESULT_CACHE", "DIR") or DEFAULT_DIR),
+                            max_bytes=config.get_int("RESULT_CACHE", "MAX_MB", DEFAULT_MAX_MB) * 1024 * 1024,
+                            max_age=config.get_float("RESULT_CACHE", "MAX_AGE_DAYS", DEFAULT_MAX_AGE_DAYS) * 86400,
+                        )
+                    except OSError as e:
+                        print(f"[BFL] Result cache unavailable: {str(e)}")
+                        _cache = False
+    return _cache or None
+
+
+def setup():
+    register_server_routes()
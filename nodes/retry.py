@@ -0,0 +1,187 @@
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from urllib3.exceptions import NewConnectionError
+
+from .config import get_config_loader
+
+DEFAULT_MAX_ATTEMPTS = 3
+DEFAULT_BASE_DELAY = 0.5  # seconds
+DEFAULT_MAX_DELAY = 8.0  # seconds
+DEFAULT_BREAKER_FAILURES = 5  # consecutive failures that open a circuit
+DEFAULT_BREAKER_RESET = 30.0  # seconds an open circuit fails fast before letting a trial request through
+
+RETRYABLE_STATUS = {500, 502, 503, 504}
+# A POST may already have created a task unless the server explicitly refused it
+RETRYABLE_POST_STATUS = {503}
+
+
+class CircuitOpenError(Exception):
+    """
+    Raised instead of sending a request while the circuit for its host and endpoint is open.
+
+    `retry_after` is the number of seconds until the circuit lets a trial request through.
+    """
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class RetryPolicy:
+    """
+    Jittered exponential backoff: attempt n waits a random time in [0, min(max_delay, base_delay * 2^(n-1))].
+    """
+
+    def __init__(self, max_attempts=DEFAULT_MAX_ATTEMPTS, base_delay=DEFAULT_BASE_DELAY, max_delay=DEFAULT_MAX_DELAY):
+        self.max_attempts = max(max_attempts, 1)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def delay(self, attempt):
+        return random.uniform(0.0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+
+class CircuitBreaker:
+    """
+    Fails fast while an endpoint is down.
+
+    After `failure_threshold` consecutive failures the circuit opens and every call raises CircuitOpenError
+    for `reset_timeout` seconds. Then a single trial request is let through: success closes the circuit,
+    failure opens it again.
+    """
+
+    def __init__(self, name, failure_threshold=DEFAULT_BREAKER_FAILURES, reset_timeout=DEFAULT_BREAKER_RESET):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self._opened_at is None:
+                return
+            remaining = self._opened_at + self.reset_timeout - time.monotonic()
+            if remaining <= 0 and not self._trial:
+                self._trial = True
+                return
+            # While a trial request is out, retry after a full reset period
+            retry_after = remaining if remaining > 0 else self.reset_timeout
+            raise CircuitOpenError(f"{self.name} is failing, not sending requests for {retry_after:.0f}s", retry_after)
+
+    def record_success(self):
+        with self._lock:
+            if self._opened_at is not None:
+                print(f"[BFL] Circuit for {self.name} closed again")
+            self._failures = 0
+            self._opened_at = None
+            self._trial = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._trial or (self._opened_at is None and self._failures >= self.failure_threshold):
+                print(f"[BFL] Circuit for {self.name} opened after {self._failures} failures")
+                self._opened_at = time.monotonic()
+                self._trial = False
+
+
+def _not_sent(error):
+    """True when a request failed before reaching the server, so even a POST can be repeated safely."""
+    if isinstance(error, requests.ConnectTimeout):
+        return True
+    reason = getattr(error.args[0], "reason", None) if error.args else None
+    return isinstance(reason, NewConnectionError)
+
+
+def _retryable(method, response=None, error=None):
+    if error is not None:
+        if method == "GET":
+            return isinstance(error, (requests.ConnectionError, requests.Timeout))
+        return _not_sent(error)
+    return response.status_code in (RETRYABLE_STATUS if method == "GET" else RETRYABLE_POST_STATUS)
+
+
+def _send_with_retry(method, label, send, policy):
+    for attempt in range(1, policy.max_attempts + 1):
+        try:
+            response = send()
+        except requests.RequestException as e:
+            if attempt == policy.max_attempts or not _retryable(method, error=e):
+                raise
+            print(f"[BFL] {method} {label} failed ({type(e).__name__}), retry {attempt}/{policy.max_attempts - 1}")
+        else:
+            if attempt == policy.max_attempts or not _retryable(method, response=response):
+                return response
+            print(f"[BFL] {method} {label} returned {response.status_code}, retry {attempt}/{policy.max_attempts - 1}")
+            response.close()
+        time.sleep(policy.delay(attempt))
+
+
+def call_with_retry(method, url, label, send):
+    """
+    Send a request through the retry policy and the circuit breaker for its host and `label`.
+
+    The breaker is checked once before the first attempt and records the outcome of the whole call, so a
+    call that exhausts its retries counts as a single failure. Any exception counts as a failure, so a
+    half-open circuit always learns the result of its trial request.
+
+    Args:
+        method: "GET" (idempotent, retried on connection errors, timeouts and 5xx) or "POST"
+            (retried only when the request never reached the server or was refused with 503).
+        url: Request URL, used to pick the circuit breaker by host.
+        label: Endpoint name for the circuit breaker, e.g. "flux-2-pro", "get_result", "download".
+        send: Callable making the request and returning the response.
+    """
+    policy = get_retry_policy()
+    breaker = get_circuit_breaker(urlsplit(url).netloc, label)
+    breaker.allow()
+    try:
+        response = _send_with_retry(method, label, send, policy)
+    except BaseException:
+        breaker.record_failure()
+        raise
+    if response.status_code >= 500:
+        breaker.record_failure()
+    else:
+        breaker.record_success()
+    return response
+
+
+_retry_policy = None
+_breakers = {}
+_lock = threading.Lock()
+
+
+def get_retry_policy():
+    """Return the process-wide RetryPolicy, configured from the [RETRY] section of config.ini."""
+    global _retry_policy
+    if _retry_policy is None:
+        config = get_config_loader()
+        _retry_policy = RetryPolicy(
+            max_attempts=config.get_int("RETRY", "MAX_ATTEMPTS", DEFAULT_MAX_ATTEMPTS),
+            base_delay=config.get_float("RETRY", "BASE_DELAY", DEFAULT_BASE_DELAY),
+            max_delay=config.get_float("RETRY", "MAX_DELAY", DEFAULT_MAX_DELAY),
+        )
+    return _retry_policy
+
+
+def get_circuit_breaker(host, label):
+    """Return the shared CircuitBreaker for a host (global or regional API, delivery CDN) and endpoint."""
+    with _lock:
+        breaker = _breakers.get((host, label))
+        if breaker is None:
+            config = get_config_loader()
+            breaker = CircuitBreaker(
+                f"{label} on {host}",
+                failure_threshold=config.get_int("RETRY", "BREAKER_FAILURES", DEFAULT_BREAKER_FAILURES),
+                reset_timeout=config.get_float("RETRY", "BREAKER_RESET", DEFAULT_BREAKER_RESET),
+            )
+            _breakers[(host, label)] = breaker
+        return breaker
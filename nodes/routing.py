@@ -0,0 +1,173 @@
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import urljoin, urlsplit
+
+import requests
+
+from .config import get_config_loader
+from .session import get_session
+
+GLOBAL_HOST = "api.bfl.ai"
+DEFAULT_PROBE_INTERVAL = 60.0  # seconds between latency probes
+DEFAULT_MAX_ERROR_RATE = 0.5  # hosts failing more probes than this are skipped
+PROBE_TIMEOUT = 5  # seconds
+SMOOTHING = 0.3  # weight of the newest probe in the moving averages
+SWITCH_MARGIN = 0.8  # another host must be 20% faster before routing moves over, to avoid flapping
+MAX_TASK_URLS = 1024
+
+# Paths that must not move between hosts: finetunes live in the region they were created in, and
+# get_result only knows the tasks submitted to the same host.
+PINNED_PATHS = ("get_result", "finetune", "my_finetunes", "delete_finetune")
+
+
+class HostStats:
+    def __init__(self):
+        self.rtt = None
+        self.error_rate = 0.0
+        self.samples = 0
+
+    def record(self, rtt=None, ok=True):
+        self.samples += 1
+        self.error_rate = (1 - SMOOTHING) * self.error_rate + SMOOTHING * (0.0 if ok else 1.0)
+        if ok and rtt is not None:
+            self.rtt = rtt if self.rtt is None else (1 - SMOOTHING) * self.rtt + SMOOTHING * rtt
+
+
+class RegionRouter:
+    """
+    Picks the API host for requests that may be served by any region.
+
+    A background thread probes the global and regional hosts every `probe_interval` seconds and keeps a
+    moving average of round-trip time and error rate per host. best_region() returns the fastest host
+    whose error rate is at most `max_error_rate`, or None (use the global host) until there is data.
+    """
+
+    def __init__(self, hosts, probe_interval=DEFAULT_PROBE_INTERVAL, max_error_rate=DEFAULT_MAX_ERROR_RATE):
+        self.hosts = hosts
+        self.probe_interval = probe_interval
+        self.max_error_rate = max_error_rate
+        self._stats = {region: HostStats() for region in hosts}
+        self._current = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def record(self, region, rtt=None, ok=True):
+        with self._lock:
+            self._stats[region].record(rtt, ok)
+
+    def probe(self):
+        """Measure every host once. Any HTTP answer below 500 counts as reachable."""
+        session = get_session()
+        for region, base_url in self.hosts.items():
+            parts = urlsplit(base_url)
+            started = time.monotonic()
+            try:
+                response = session.head(f"{parts.scheme}://{parts.netloc}/", timeout=PROBE_TIMEOUT)
+                self.record(region, time.monotonic() - started, response.status_code < 500)
+            except requests.RequestException:
+                self.record(region, ok=False)
+
+    def best_region(self):
+        with self._lock:
+            healthy = {
+                region: stats.rtt
+                for region, stats in self._stats.items()
+                if stats.rtt is not None and stats.error_rate <= self.max_error_rate
+            }
+            if not healthy:
+                return None
+            best = min(healthy, key=healthy.get)
+            current = self._current
+            if current in healthy and healthy[best] >= SWITCH_MARGIN * healthy[current]:
+                return current
+            if best != current:
+                print(f"[BFL] Routing requests to {self.hosts[best]} ({healthy[best] * 1000:.0f} ms)")
+                self._current = best
+            return best
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name="bfl-routing", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            self.probe()
+            time.sleep(self.probe_interval)
+
+
+def is_routable(path):
+    return not any(pinned in path.split("?")[0] for pinned in PINNED_PATHS)
+
+
+_task_urls = OrderedDict()
+_task_urls_lock = threading.Lock()
+
+
+def remember_polling_url(task_id, polling_url):
+    """Keep the get_result URL of a submitted task, so it is polled on the host that accepted it."""
+    with _task_urls_lock:
+        _task_urls[task_id] = polling_url
+        while len(_task_urls) > MAX_TASK_URLS:
+            _task_urls.popitem(last=False)
+
+
+def polling_url_for(task_id):
+    with _task_urls_lock:
+        return _task_urls.get(task_id)
+
+
+def trusted_polling_url(polling_url, submit_url, task_id):
+    """The polling_url from a submit response if it points at a BFL host, else get_result on the submit host."""
+    if polling_url:
+        parts = urlsplit(polling_url)
+        host = parts.hostname or ""
+        if parts.scheme == "https" and (host == GLOBAL_HOST or host.endswith(".bfl.ai")):
+            return polling_url
+        if parts.netloc == urlsplit(submit_url).netloc:
+            return polling_url
+    return urljoin(submit_url, f"get_result?id={task_id}")
+
+
+_router = None
+_router_lock = threading.Lock()
+
+
+def get_region_router():
+    """
+    Return the process-wide RegionRouter when MODE = auto in the [ROUTING] section of config.ini, else None.
+
+    Routing only applies while BASE_URL points at the global BFL API, so proxies and custom hosts are left alone.
+    """
+    global _router
+    if _router is None:
+        with _router_lock:
+            if _router is None:
+                config = get_config_loader()
+                try:
+                    base_url = config.get_key("API", "BASE_URL")
+                except KeyError:
+                    return None
+                if config.get_str("ROUTING", "MODE", "global").lower() != "auto":
+                    _router = False
+                elif urlsplit(base_url).hostname != GLOBAL_HOST:
+                    print(f"[BFL] Auto routing disabled: BASE_URL {base_url} is not the global API")
+                    _router = False
+                else:
+                    hosts = {"global": base_url}
+                    hosts.update({region: urljoin(url, "/v1/") for region, url in config.regional_endpoints.items()})
+                    _router = RegionRouter(
+                        hosts,
+                        probe_interval=config.get_float("ROUTING", "PROBE_INTERVAL", DEFAULT_PROBE_INTERVAL),
+                        max_error_rate=config.get_float("ROUTING", "MAX_ERROR_RATE", DEFAULT_MAX_ERROR_RATE),
+                    )
+                    _router.start()
+    return _router or None
+
+
+def setup():
+    """Start probing at load time so the first node run already has measurements."""
+    get_region_router()
@@ -0,0 +1,32 @@
+DEFAULT_STANDALONE_HOST = "0.0.0.0"  # interface of the standalone listeners when STANDALONE_HOST is not set
+
+
+def _routes():
+    """The route table of the running ComfyUI server, or None outside ComfyUI or before it started."""
+    try:
+        from server import PromptServer
+    except ImportError:
+        return None
+    instance = getattr(PromptServer, "instance", None)
+    return instance.routes if instance is not None else None
+
+
+def register_route(method, path, handler):
+    """
+    Add an aiohttp handler for `method` and `path` to the running ComfyUI server.
+
+    Returns:
+        True when the route was added, False when there is no ComfyUI server to add it to.
+    """
+    routes = _routes()
+    if routes is None:
+        return False
+    routes.route(method, path)(handler)
+    return True
+
+
+def json_response(data, status=200):
+    """aiohttp JSON response, for handlers added with register_route()."""
+    from aiohttp import web
+
+    return web.json_response(data, status=status)
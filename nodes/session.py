@@ -0,0 +1,78 @@
+import http.cookiejar
+import threading
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .config import get_config_loader
+
+DEFAULT_POOL_CONNECTIONS = 8  # distinct hosts kept alive (global, regional, delivery CDN)
+DEFAULT_POOL_MAXSIZE = 32  # keep-alive connections per host
+WARM_UP_TIMEOUT = 5  # seconds
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def _create_session():
+    config = get_config_loader()
+    pool_connections = config.get_int("HTTP", "POOL_CONNECTIONS", DEFAULT_POOL_CONNECTIONS)
+    pool_maxsize = config.get_int("HTTP", "POOL_MAXSIZE", DEFAULT_POOL_MAXSIZE)
+
+    session = requests.Session()
+    # Never keep cookies from responses: the session is shared by every node, API key and thread
+    session.cookies.set_policy(http.cookiejar.DefaultCookiePolicy(allowed_domains=[]))
+    # pool_block=False: a burst above pool_maxsize opens extra connections instead of stalling,
+    # only pool_maxsize of them are kept alive afterwards.
+    adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize, pool_block=False)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    print(f"[BFL] HTTP session ready ({pool_connections} host pools x {pool_maxsize} connections)")
+    return session
+
+
+def get_session():
+    """
+    Return the process-wide HTTP session shared by every BFL node.
+
+    The session keeps one keep-alive connection pool per host, so submits, polls, downloads and
+    management calls reuse TCP+TLS connections instead of paying a handshake per request.
+    Its cookie policy rejects every cookie and the API key travels only in each request's headers, so no
+    per-account state is stored on it and it is safe to share between threads.
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = _create_session()
+    return _session
+
+
+def warm_up(urls=None):
+    """
+    Open connections to the API hosts in the background so the first node run skips the handshake.
+
+    Args:
+        urls: Optional list of URLs to connect to. Defaults to the BASE_URL from config.ini.
+    """
+    config = get_config_loader()
+    if not config.get_bool("HTTP", "WARM_UP", True):
+        return
+
+    if urls is None:
+        try:
+            urls = [config.get_key("API", "BASE_URL")]
+        except KeyError:
+            return
+
+    def _connect():
+        session = get_session()
+        for url in urls:
+            parts = urlsplit(url)
+            try:
+                session.head(f"{parts.scheme}://{parts.netloc}/", timeout=WARM_UP_TIMEOUT)
+            except requests.RequestException as e:
+                print(f"[BFL] Connection warm-up to {parts.netloc} failed: {str(e)}")
+
+    threading.Thread(target=_connect, name="bfl-warm-up", daemon=True).start()
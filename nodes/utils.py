@@ -1,8 +1,4 @@
-import base64
-import io
-
-import numpy as np
-from PIL import Image
+from .images import encode_batch, encode_mask_batch, save_options
 
 
 class ImageToBase64:
@@ -13,28 +9,103 @@ class ImageToBase64:
                 "image": ("IMAGE",),
             },
             "optional": {
-                "image_format": (["jpeg", "png"], {"default": "jpeg"}),
+                "image_format": (["jpeg", "png", "webp"], {"default": "jpeg"}),
+                "quality": (
+                    "INT",
+                    {"default": 75, "min": 1, "max": 100, "tooltip": "JPEG/WebP quality. Ignored for PNG."},
+                ),
+                "png_compression": (
+                    "INT",
+                    {
+                        "default": 6,
+                        "min": 0,
+                        "max": 9,
+                        "tooltip": "PNG zlib level: 0 = fastest/largest, 9 = slowest/smallest. Lossless either way.",
+                    },
+                ),
             },
         }
 
-    RETURN_TYPES = ("STRING",)
+    RETURN_TYPES = ("STRING", "STRING")
+    RETURN_NAMES = ("base64", "base64_list")
+    OUTPUT_IS_LIST = (False, True)
+    OUTPUT_TOOLTIPS = (
+        "The first image of the batch.",
+        "Every image of the batch as a list, so a generation node connected here runs once per image.",
+    )
     FUNCTION = "convert"
     CATEGORY = "BFL/Utils"
 
-    def convert(self, image, image_format="jpeg"):
-        img_array = (image[0].numpy() * 255).astype(np.uint8)
-        pil_image = Image.fromarray(img_array)
+    def convert(self, image, image_format="jpeg", quality=75, png_compression=6):
+        options = save_options(image_format, quality=quality, compress_level=png_compression)
+        encoded = encode_batch(image, image_format, **options)
+        return (encoded[0], encoded)
 
-        pil_image = pil_image.convert("RGB")
 
-        buffer = io.BytesIO()
-        pil_image.save(buffer, format=image_format.upper())
+class MaskToBase64:
+    @classmethod
+    def INPUT_TYPES(cls):
+        return {
+            "required": {
+                "mask": ("MASK",),
+            },
+            "optional": {
+                "threshold": (
+                    "FLOAT",
+                    {"default": 0.5, "min": 0.0, "max": 1.0, "step": 0.01, "tooltip": "Values above this are masked."},
+                ),
+                "dilate_pixels": (
+                    "INT",
+                    {"default": 0, "min": 0, "max": 64, "tooltip": "Grow the mask by this many pixels."},
+                ),
+                "feather_pixels": (
+                    "INT",
+                    {
+                        "default": 0,
+                        "min": 0,
+                        "max": 64,
+                        "tooltip": "Soften the mask edge over this many pixels. Needs 8-bit; 1-bit ignores it.",
+                    },
+                ),
+                "bit_depth": (
+                    ["1-bit", "8-bit"],
+                    {
+                        "default": "1-bit",
+                        "tooltip": "1-bit: pure black/white, smallest PNG. 8-bit: grayscale, keeps feathered edges.",
+                    },
+                ),
+                "png_compression": (
+                    "INT",
+                    {"default": 6, "min": 0, "max": 9, "tooltip": "PNG zlib level: 0 = fastest/largest, 9 = smallest."},
+                ),
+            },
+        }
 
-        b64 = base64.b64encode(buffer.getvalue()).decode("utf-8")
+    RETURN_TYPES = ("STRING", "STRING")
+    RETURN_NAMES = ("base64", "base64_list")
+    OUTPUT_IS_LIST = (False, True)
+    OUTPUT_TOOLTIPS = (
+        "The first mask of the batch, as a black/white PNG for Flux Pro Fill or Flux Erase.",
+        "Every mask of the batch as a list, so a generation node connected here runs once per mask.",
+    )
+    FUNCTION = "convert"
+    CATEGORY = "BFL/Utils"
 
-        return (b64,)
+    def convert(self, mask, threshold=0.5, dilate_pixels=0, feather_pixels=0, bit_depth="1-bit", png_compression=6):
+        depth = 1 if bit_depth == "1-bit" else 8
+        if depth == 1 and feather_pixels:
+            print("[BFL] feather_pixels has no effect on a 1-bit mask, use 8-bit to keep soft edges")
+            feather_pixels = 0
+        encoded = encode_mask_batch(mask, threshold, dilate_pixels, feather_pixels, depth, png_compression)
+        return (encoded[0], encoded)
 
 
-NODE_CLASS_MAPPINGS = {"ImageToBase64_BFL": ImageToBase64}
+NODE_CLASS_MAPPINGS = {
+    "ImageToBase64_BFL": ImageToBase64,
+    "MaskToBase64_BFL": MaskToBase64,
+}
 
-NODE_DISPLAY_NAME_MAPPINGS = {"ImageToBase64_BFL": "Image to Base64 (BFL)"}
+NODE_DISPLAY_NAME_MAPPINGS = {
+    "ImageToBase64_BFL": "Image to Base64 (BFL)",
+    "MaskToBase64_BFL": "Mask to Base64 (BFL)",
+}
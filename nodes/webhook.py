@@ -0,0 +1,237 @@
+import hashlib
+import hmac
+import json
+import threading
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+from .config import get_config_loader
+from .poller import get_poller
+from .polling import PollingPolicy
+from .server_routes import DEFAULT_STANDALONE_HOST, json_response, register_route
+from .status import Status
+
+WEBHOOK_ROUTE = "/bfl/webhook"
+SIGNATURE_HEADER = "X-Webhook-Signature"
+MAX_EARLY_DELIVERIES = 256  # results pushed before their task was handed to the poller
+MAX_UNVERIFIED_DELIVERIES = 32  # early deliveries waiting for their task's own webhook_secret
+MAX_BODY_BYTES = 1024 * 1024
+
+# Webhook payloads report "SUCCESS"/"FAILED" where get_result reports "Ready"/"Error"
+_WEBHOOK_STATUSES = {"success": Status.READY, "failed": Status.ERROR, "error": Status.ERROR}
+
+
+def verify_signature(secret, body, signature):
+    """Check an HMAC-SHA256 webhook signature ("sha256=<hex>" or bare hex) of the raw body."""
+    if not secret or not signature:
+        return False
+    expected = hmac.new(secret.encode("utf-8"), body, hashlib.sha256).hexdigest()
+    signature = signature.strip()
+    if signature.startswith("sha256="):
+        signature = signature[len("sha256=") :]
+    return hmac.compare_digest(expected, signature)
+
+
+def _parse_status(value):
+    try:
+        return Status(value)
+    except ValueError:
+        return _WEBHOOK_STATUSES.get(str(value).lower())
+
+
+class WebhookReceiver:
+    """
+    Receives BFL completion webhooks and wakes the node waiting on the task.
+
+    Nodes that submit with a webhook_url announce the task with expect(); a verified delivery then
+    resolves the task's future in the central poller immediately. Polling keeps running on the slow
+    safety-net schedule from safety_net_policy() in case a delivery never arrives.
+
+    A fast task can be delivered before expect() has registered its secret. A delivery for an unknown task
+    that does not verify with the default secret is therefore held back and verified once expect() supplies
+    the task's own webhook_secret.
+    """
+
+    def __init__(self, default_secret="", public_url="", hosts=()):
+        self.default_secret = default_secret
+        self.public_url = public_url
+        self.hosts = {host.lower() for host in hosts if host}
+        if public_url:
+            self.hosts.add(urlsplit(public_url).netloc.lower())
+        self.active = False
+        self._secrets = {}
+        self._early = OrderedDict()
+        self._unverified = OrderedDict()
+        self._lock = threading.Lock()
+
+    def apply_defaults(self, arguments):
+        """Point requests without their own webhook_url at this receiver when PUBLIC_URL is configured."""
+        if self.active and self.public_url and not arguments.get("webhook_url"):
+            arguments = {**arguments, "webhook_url": self.public_url}
+            if self.default_secret:
+                arguments["webhook_secret"] = self.default_secret
+        return arguments
+
+    def targets(self, webhook_url):
+        """True when `webhook_url` is PUBLIC_URL, or the webhook route on PUBLIC_URL's host or one of HOSTS."""
+        if not webhook_url:
+            return False
+        if self.public_url and webhook_url == self.public_url:
+            return True
+        parts = urlsplit(webhook_url)
+        return parts.netloc.lower() in self.hosts and parts.path.rstrip("/").endswith(WEBHOOK_ROUTE)
+
+    def expect(self, task_id, webhook_url, webhook_secret=""):
+        """
+        Register a submitted task. Returns True when its completion is expected to be pushed here.
+
+        Tasks whose webhook_url points at another receiver are not registered and keep the normal polling schedule.
+        """
+        if not self.active or not self.targets(webhook_url):
+            with self._lock:
+                self._unverified.pop(task_id, None)
+            return False
+        secret = webhook_secret or self.default_secret
+        with self._lock:
+            self._secrets[task_id] = secret
+            held = self._unverified.pop(task_id, None)
+        if held is not None:
+            body, signature = held
+            if verify_signature(secret, body, signature):
+                self._accept(task_id, json.loads(body))
+            else:
+                print(f"[BFL] Rejected webhook for task {task_id}: bad or missing signature")
+        return True
+
+    def expects(self, task_id):
+        with self._lock:
+            return task_id in self._secrets
+
+    def take(self, task_id):
+        """Pop a delivery that arrived before the task was tracked, as (status, result), or None."""
+        with self._lock:
+            return self._early.pop(task_id, None)
+
+    def forget(self, task_id):
+        with self._lock:
+            self._secrets.pop(task_id, None)
+            self._unverified.pop(task_id, None)
+
+    def safety_net_policy(self, policy):
+        """Slow polling schedule for tasks whose completion will be pushed, keeping the endpoint's timeout."""
+        return PollingPolicy(
+            first_delay=max(policy.first_delay, 10.0), factor=1.5, max_delay=30.0, timeout=policy.timeout
+        )
+
+    def deliver(self, body, signature):
+        """
+        Handle one webhook request body.
+
+        Returns:
+            (http_status, message) for the HTTP response; 202 when the delivery is held until expect().
+        """
+        try:
+            payload = json.loads(body)
+            task_id = payload.get("task_id") or payload.get("id")
+        except (ValueError, AttributeError):
+            return 400, "invalid payload"
+        if not task_id:
+            return 400, "missing task id"
+
+        with self._lock:
+            secret = self._secrets.get(task_id)
+            if secret is None and not verify_signature(self.default_secret, body, signature):
+                # Possibly a task with its own webhook_secret whose submit has not returned yet
+                self._unverified[task_id] = (body, signature)
+                while len(self._unverified) > MAX_UNVERIFIED_DELIVERIES:
+                    self._unverified.popitem(last=False)
+                return 202, "pending verification"
+        if secret is not None and not verify_signature(secret, body, signature):
+            print(f"[BFL] Rejected webhook for task {task_id}: bad or missing signature")
+            return 401, "invalid signature"
+        return self._accept(task_id, payload)
+
+    def _accept(self, task_id, payload):
+        status = _parse_status(payload.get("status"))
+        if status is None or status == Status.PENDING:
+            return 200, "ignored"
+        print(f"[BFL] Webhook: task {task_id} finished with status '{status.value}'")
+
+        if not get_poller().complete(task_id, status, payload):
+            with self._lock:
+                self._early[task_id] = (status, payload)
+                while len(self._early) > MAX_EARLY_DELIVERIES:
+                    self._early.popitem(last=False)
+        return 200, "ok"
+
+
+class _StandaloneHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        if self.path.split("?")[0] != WEBHOOK_ROUTE or length > MAX_BODY_BYTES:
+            self.send_error(404 if length <= MAX_BODY_BYTES else 413)
+            return
+        status, message = get_webhook_receiver().deliver(self.rfile.read(length), self.headers.get(SIGNATURE_HEADER))
+        body = json.dumps({"message": message}).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def start_standalone(host, port):
+    """Serve the webhook route from a small HTTP listener of its own, for setups without the ComfyUI server."""
+    server = ThreadingHTTPServer((host, port), _StandaloneHandler)
+    threading.Thread(target=server.serve_forever, name="bfl-webhook", daemon=True).start()
+    print(f"[BFL] Webhook listener on http://{host}:{server.server_address[1]}{WEBHOOK_ROUTE}")
+    return server
+
+
+def register_server_routes():
+    """Add the webhook route to the running ComfyUI server, if there is one."""
+
+    async def bfl_webhook(request):
+        body = await request.read()
+        status, message = get_webhook_receiver().deliver(body, request.headers.get(SIGNATURE_HEADER))
+        return json_response({"message": message}, status=status)
+
+    return register_route("POST", WEBHOOK_ROUTE, bfl_webhook)
+
+
+_receiver = None
+_receiver_lock = threading.Lock()
+
+
+def get_webhook_receiver():
+    """Return the process-wide WebhookReceiver, configured from the [WEBHOOK] section of config.ini."""
+    global _receiver
+    if _receiver is None:
+        with _receiver_lock:
+            if _receiver is None:
+                config = get_config_loader()
+                _receiver = WebhookReceiver(
+                    default_secret=config.get_str("WEBHOOK", "SECRET"),
+                    public_url=config.get_str("WEBHOOK", "PUBLIC_URL"),
+                    hosts=[host.strip() for host in config.get_str("WEBHOOK", "HOSTS").split(",")],
+                )
+    return _receiver
+
+
+def setup():
+    """Activate the receiver on the ComfyUI server and/or a standalone port when ENABLED in config.ini."""
+    config = get_config_loader()
+    if not config.get_bool("WEBHOOK", "ENABLED", False):
+        return
+    receiver = get_webhook_receiver()
+    if register_server_routes():
+        receiver.active = True
+        print(f"[BFL] Webhook receiver registered at {WEBHOOK_ROUTE}")
+    port = config.get_int("WEBHOOK", "STANDALONE_PORT", 0)
+    if port:
+        start_standalone(config.get_str("WEBHOOK", "STANDALONE_HOST", DEFAULT_STANDALONE_HOST), port)
+        receiver.active = True
@@ -1,35 +1,86 @@
 import { app } from "../../../scripts/app.js";
+import { api } from "../../../scripts/api.js";
 import { ComfyWidgets } from "../../../scripts/widgets.js";
 
-app.registerExtension({
-	name: "BFL.Credits",
-	async beforeRegisterNodeDef(nodeType, nodeData, app) {
-		if (nodeData.name !== "FluxCredits_BFL") return;
-
-		function populate(text) {
-			if (this.widgets) {
-				for (let i = 0; i < this.widgets.length; i++) {
-					this.widgets[i].onRemove?.();
-				}
-				this.widgets.length = 0;
-			}
+const NODE_NAME = "FluxCredits_BFL";
+const DEFAULT_POLL_INTERVAL = 15;
+
+// One poll of /bfl/credits for every Flux Credits node in the graph, running while at least one exists
+const live = {
+	nodes: new Set(),
+	timer: null,
+	interval: DEFAULT_POLL_INTERVAL,
+};
+
+function usesOwnConfig(node) {
+	return node.inputs?.some((input) => input.name === "config" && input.link != null);
+}
 
-			const v = Array.isArray(text) ? text : [text];
-			for (const l of v) {
-				const w = ComfyWidgets["STRING"](this, "credits_result", ["STRING", { multiline: true }], app).widget;
-				w.inputEl.readOnly = true;
-				w.inputEl.style.opacity = 0.6;
-				w.value = l;
+async function pollCredits() {
+	live.timer = null;
+	if (!live.nodes.size) return;
+	if (!document.hidden) {
+		let text;
+		try {
+			const response = await api.fetchApi("/bfl/credits");
+			const data = await response.json();
+			live.interval = data.poll_interval || DEFAULT_POLL_INTERVAL;
+			text = data.error ? data.error : `${data.text}\n(live, ${new Date().toLocaleTimeString()})`;
+		} catch (e) {
+			text = null;
+		}
+		if (text !== null) {
+			for (const node of live.nodes) {
+				// Nodes with a Flux Config (BFL) input use another key, their value comes from running them
+				if (!usesOwnConfig(node)) populate.call(node, text);
 			}
+		}
+	}
+	scheduleCredits();
+}
+
+function scheduleCredits() {
+	if (live.timer === null && live.nodes.size) {
+		live.timer = setTimeout(pollCredits, live.interval * 1000);
+	}
+}
 
-			requestAnimationFrame(() => {
-				const sz = this.computeSize();
-				if (sz[0] < this.size[0]) sz[0] = this.size[0];
-				if (sz[1] < this.size[1]) sz[1] = this.size[1];
-				this.onResize?.(sz);
-				app.graph.setDirtyCanvas(true, false);
-			});
+function populate(text) {
+	const v = Array.isArray(text) ? text : [text];
+	const existing = this.widgets?.filter((w) => w.name === "credits_result") ?? [];
+	if (existing.length === v.length) {
+		existing.forEach((w, i) => (w.value = v[i]));
+		app.graph.setDirtyCanvas(true, false);
+		return;
+	}
+
+	if (this.widgets) {
+		for (let i = 0; i < this.widgets.length; i++) {
+			this.widgets[i].onRemove?.();
 		}
+		this.widgets.length = 0;
+	}
+
+	for (const l of v) {
+		const w = ComfyWidgets["STRING"](this, "credits_result", ["STRING", { multiline: true }], app).widget;
+		w.inputEl.readOnly = true;
+		w.inputEl.style.opacity = 0.6;
+		w.value = l;
+	}
+
+	requestAnimationFrame(() => {
+		const sz = this.computeSize();
+		if (sz[0] < this.size[0]) sz[0] = this.size[0];
+		if (sz[1] < this.size[1]) sz[1] = this.size[1];
+		this.onResize?.(sz);
+		app.graph.setDirtyCanvas(true, false);
+	});
+}
+
+app.registerExtension({
+	name: "BFL.Credits",
+	async beforeRegisterNodeDef(nodeType, nodeData, app) {
+		if (nodeData.name !== NODE_NAME) return;
 
 		const onExecuted = nodeType.prototype.onExecuted;
 		nodeType.prototype.onExecuted = function (message) {
@@ -37,6 +88,24 @@ app.registerExtension({
 			populate.call(this, message.text);
 		};
 
+		const onAdded = nodeType.prototype.onAdded;
+		nodeType.prototype.onAdded = function () {
+			onAdded?.apply(this, arguments);
+			const first = !live.nodes.size;
+			live.nodes.add(this);
+			if (first) pollCredits();
+		};
+
+		const onRemoved = nodeType.prototype.onRemoved;
+		nodeType.prototype.onRemoved = function () {
+			onRemoved?.apply(this, arguments);
+			live.nodes.delete(this);
+			if (!live.nodes.size && live.timer !== null) {
+				clearTimeout(live.timer);
+				live.timer = null;
+			}
+		};
+
 		const VALUES = Symbol();
 		const configure = nodeType.prototype.configure;
 		nodeType.prototype.configure = function () {